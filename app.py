@@ -50,15 +50,19 @@ def api_info():
                 "install": "/api/dionaea/install",
                 "start": "/api/dionaea/start",
                 "stop": "/api/dionaea/stop",
-                "logs": "/api/dionaea/logs?limit=50&type=httpd",
-                "binaries": "/api/dionaea/binaries?page=1"
+                "logs": "/api/dionaea/logs?limit=50&type=httpd&cursor=CURSOR_NEXT&src_ip=192.0.2.1&backend=auto",
+                "binaries": "/api/dionaea/binaries?page=1&page_size=9&sort=ctime&order=desc&hash=HASH_PREFIX&min_size=0&max_size=1048576&type=pe&cursor=CURSOR_NEXT",
+                "similar_binaries": "/api/dionaea/binaries/similar?hash=SHA256_OR_MD5&threshold=50&limit=10"
             },
             "ddospot": {
                 "status": "/api/ddospot/status",
                 "install": "/api/ddospot/install",
                 "start": "/api/ddospot/start",
                 "stop": "/api/ddospot/stop",
-                "logs": "/api/ddospot/logs?limit=50"
+                "logs": "/api/ddospot/logs?limit=50&protocol=dnspot&timestamp=2024-01-01 00:00:00&cursor=CURSOR_NEXT&cidr=192.0.2.0/24",
+                "histogram": "/api/ddospot/histogram?protocol=all&interval=hour&timestamp_from=TIMESTAMP&timestamp_to=TIMESTAMP&top=10",
+                "index_report": "/api/ddospot/index-report",
+                "create_indexes": "/api/ddospot/create-indexes"
             },
             "splunk": {
                 "status": "/api/splunk/status",
@@ -68,8 +72,13 @@ def api_info():
                 "search": "/api/splunk/search",
                 "create": "/api/splunk/create",
                 "send": "/api/splunk/send",
+                "job": "/api/splunk/jobs/JOB_ID",
+                "shipper": "/api/splunk/shipper",
                 "set_user": "/api/splunk/set-user",
-                "set_password": "/api/splunk/set-password"
+                "set_password": "/api/splunk/set-password",
+                "set_hec_ack": "/api/splunk/set-hec-ack",
+                "set_hec_gzip": "/api/splunk/set-hec-gzip",
+                "set_hec_max_content_length": "/api/splunk/set-hec-max-content-length"
             },
             "suricata": {
                 "status": "/api/suricata/status",
@@ -319,8 +328,13 @@ def dionaea_logs():
         limit = request.args.get('limit', default=50, type=int)
         log_type = request.args.get('type', default="httpd", type=str)
         timestamp = request.args.get('timestamp', default=None, type=str)
+        cursor = request.args.get('cursor', default=None, type=str)
+        src_ip = request.args.get('src_ip', default=None, type=str)
+        backend = request.args.get('backend', default="auto", type=str)
 
-        result = dionaea_manager.get_logs(limit=limit, itype=log_type, timestamp=timestamp)
+        result = dionaea_manager.get_logs(
+            limit=limit, itype=log_type, timestamp=timestamp, cursor=cursor, src_ip=src_ip, backend=backend
+        )
         return jsonify(result)
     except Exception as e:
         return jsonify({
@@ -334,7 +348,18 @@ def dionaea_binaries():
     """Retrieves metadata of binaries captured by Dionaea"""
     try:
         page = request.args.get('page', default=1, type=int)
-        result = dionaea_manager.get_binaries(page=page)
+        page_size = request.args.get('page_size', default=9, type=int)
+        sort = request.args.get('sort', default="ctime", type=str)
+        order = request.args.get('order', default="desc", type=str)
+        hash_prefix = request.args.get('hash', default=None, type=str)
+        min_size = request.args.get('min_size', default=None, type=int)
+        max_size = request.args.get('max_size', default=None, type=int)
+        file_type = request.args.get('type', default=None, type=str)
+        cursor = request.args.get('cursor', default=None, type=str)
+        result = dionaea_manager.get_binaries(
+            page=page, page_size=page_size, sort=sort, order=order, hash_prefix=hash_prefix,
+            min_size=min_size, max_size=max_size, file_type=file_type, cursor=cursor
+        )
         return jsonify(result), 200
     except Exception as e:
         return jsonify({
@@ -343,6 +368,22 @@ def dionaea_binaries():
             "message": "Error retrieving Dionaea binaries"
         }), 500
 
+@app.route('/api/dionaea/binaries/similar', methods=['GET'])
+def dionaea_similar_binaries():
+    """Retrieves stored Dionaea samples similar to a given one"""
+    try:
+        sample_hash = request.args.get('hash', default=None, type=str)
+        threshold = request.args.get('threshold', default=50, type=int)
+        limit = request.args.get('limit', default=10, type=int)
+        result = dionaea_manager.get_similar_binaries(sample_hash=sample_hash, threshold=threshold, limit=limit)
+        return jsonify(result), 200
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "message": "Error retrieving similar Dionaea binaries"
+        }), 500
+
 
 # ============== DDOSPOT ENDPOINTS ==============
 
@@ -413,8 +454,10 @@ def ddospot_logs():
         limit = request.args.get('limit', default=50, type=int)
         protocol = request.args.get('protocol', default=None, type=str)
         timestamp = request.args.get('timestamp', default=None, type=str)
+        cursor = request.args.get('cursor', default=None, type=str)
+        cidr = request.args.get('cidr', default=None, type=str)
 
-        result = ddospot_manager.get_logs(limit=limit, protocol=protocol, timestamp=timestamp)
+        result = ddospot_manager.get_logs(limit=limit, protocol=protocol, timestamp=timestamp, cursor=cursor, cidr=cidr)
         return jsonify(result)
     except Exception as e:
         return jsonify({
@@ -423,6 +466,55 @@ def ddospot_logs():
             "message": "Error retrieving DDoSPot logs"
         }), 500
 
+@app.route('/api/ddospot/histogram', methods=['GET'])
+def ddospot_histogram():
+    """Attack volume per protocol and time bucket plus top targets, from HoneyDash's rollups"""
+    try:
+        protocol = request.args.get('protocol', default="all", type=str)
+        interval = request.args.get('interval', default="hour", type=str)
+        timestamp_from = request.args.get('timestamp_from', default=None, type=str)
+        timestamp_to = request.args.get('timestamp_to', default=None, type=str)
+        top = request.args.get('top', default=10, type=int)
+
+        result = ddospot_manager.get_histogram(protocol=protocol, interval=interval, timestamp_from=timestamp_from, timestamp_to=timestamp_to, top=top)
+        status_code = 200 if result["success"] else 400
+        return jsonify(result), status_code
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "message": "Error retrieving DDoSPot histogram"
+        }), 500
+
+@app.route('/api/ddospot/index-report', methods=['GET'])
+def ddospot_index_report():
+    """Shows the query plan of every DDoSPot log query and whether it uses an index"""
+    try:
+        result = ddospot_manager.get_index_report()
+        status_code = 200 if result["success"] else 400
+        return jsonify(result), status_code
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "message": "Error building DDoSPot index report"
+        }), 500
+
+@app.route('/api/ddospot/create-indexes', methods=['POST'])
+def ddospot_create_indexes():
+    """Creates HoneyDash indexes on DDoSPot attack tables"""
+    try:
+        data = request.get_json(silent=True) or {}
+        result = ddospot_manager.create_indexes(protocol=data.get('protocol'))
+        status_code = 200 if result["success"] else 400
+        return jsonify(result), status_code
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "message": "Error creating DDoSPot indexes"
+        }), 500
+
 # ============== SPLUNK ENDPOINTS ==============
 @app.route('/api/splunk/status', methods=['GET'])
 def splunk_status():
@@ -488,7 +580,7 @@ def splunk_stop():
 def splunk_search():
     """Searches for HoneyDash token in Slunk's HTTP Event Collector inputs"""
     try:
-        result = splunk_manager.search_token()
+        result = splunk_manager.search_token(force=True)
         return jsonify(result), 200
     except Exception as e:
         return jsonify({
@@ -522,6 +614,53 @@ def splunk_send():
             "message": "Error sending event to Splunk"
         }), 500
 
+@app.route('/api/splunk/jobs/<job_id>', methods=['GET'])
+def splunk_job(job_id):
+    """Retrieves the delivery state of a send job"""
+    try:
+        result = splunk_manager.get_job(job_id)
+        status_code = 200 if result.get("success") else 404
+        return jsonify(result), status_code
+    except Exception as e:
+        return jsonify({
+            "error": str(e),
+            "message": "Error retrieving Splunk job"
+        }), 500
+
+@app.route('/api/splunk/shipper', methods=['GET'])
+def splunk_shipper_status():
+    """Retrieves the state of the automatic shipper"""
+    try:
+        result = splunk_manager.get_shipper_status()
+        status_code = 200 if result.get("success") else 400
+        return jsonify(result), status_code
+    except Exception as e:
+        return jsonify({
+            "error": str(e),
+            "message": "Error retrieving Splunk shipper status"
+        }), 500
+
+@app.route('/api/splunk/shipper', methods=['POST'])
+def splunk_shipper_set():
+    """Enables or disables the automatic shipper"""
+    try:
+        data = request.get_json()
+
+        if not data or 'enabled' not in data:
+            return jsonify({
+                "success": False,
+                "message": "'enabled' field is required in JSON"
+            }), 400
+
+        result = splunk_manager.set_shipping(data['enabled'])
+        status_code = 200 if result.get("success") else 400
+        return jsonify(result), status_code
+    except Exception as e:
+        return jsonify({
+            "error": str(e),
+            "message": "Error updating Splunk shipper"
+        }), 500
+
 @app.route('/api/splunk/set-user', methods=['POST'])
 def splunk_set_user():
     """Manually sets Splunk username in config file"""
@@ -566,6 +705,72 @@ def splunk_set_password():
             "message": "Error setting Splunk password"
         }), 500
 
+@app.route('/api/splunk/set-hec-ack', methods=['POST'])
+def splunk_set_hec_ack():
+    """Enables or disables HEC indexer acknowledgement"""
+    try:
+        data = request.get_json()
+
+        if not data or 'enabled' not in data:
+            return jsonify({
+                "success": False,
+                "message": "'enabled' field is required in JSON"
+            }), 400
+
+        result = splunk_manager.set_hec_ack(data['enabled'])
+        status_code = 200 if result["success"] else 400
+        return jsonify(result), status_code
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "message": "Error setting HEC indexer acknowledgement"
+        }), 500
+
+@app.route('/api/splunk/set-hec-gzip', methods=['POST'])
+def splunk_set_hec_gzip():
+    """Enables or disables gzip compression of HEC requests"""
+    try:
+        data = request.get_json()
+
+        if not data or 'enabled' not in data:
+            return jsonify({
+                "success": False,
+                "message": "'enabled' field is required in JSON"
+            }), 400
+
+        result = splunk_manager.set_hec_gzip(data['enabled'])
+        status_code = 200 if result["success"] else 400
+        return jsonify(result), status_code
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "message": "Error setting HEC compression"
+        }), 500
+
+@app.route('/api/splunk/set-hec-max-content-length', methods=['POST'])
+def splunk_set_hec_max_content_length():
+    """Sets the byte limit of HEC batches"""
+    try:
+        data = request.get_json()
+
+        if not data or 'bytes' not in data:
+            return jsonify({
+                "success": False,
+                "message": "'bytes' field is required in JSON"
+            }), 400
+
+        result = splunk_manager.set_hec_max_content_length(data['bytes'])
+        status_code = 200 if result["success"] else 400
+        return jsonify(result), status_code
+    except Exception as e:
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "message": "Error setting HEC max content length"
+        }), 500
+
 # ============== SURICATA ENDPOINTS ==============
 @app.route('/api/suricata/status', methods=['GET'])
 def suricata_status():
@@ -724,6 +929,10 @@ def signal_handler(signal, frame):
     print("\n\n[!] Shutting down HoneyDash...")
     print("[!] Restoring any modified configurations...\n")
     cowrie_manager.cleanup()
+    cowrie_manager.close()
+    ddospot_manager.close()
+    dionaea_manager.close()
+    splunk_manager.close()
     sys.exit(0)
 
 
@@ -771,5 +980,12 @@ if __name__ == '__main__':
     splunk_manager = SplunkManager()
     # Start Suricata manager
     suricata_manager = SuricataManager()
+    # Ship new honeypot and IDS events to Splunk server-side (when enabled)
+    splunk_manager.start_shipper({
+        "cowrie": cowrie_manager.get_new_logs,
+        "dionaea": dionaea_manager.get_new_logs,
+        "ddospot": ddospot_manager.get_new_logs,
+        "suricata": suricata_manager.get_new_logs
+    })
 
     app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False) # Set to False to avoid running the initialization twice
\ No newline at end of file
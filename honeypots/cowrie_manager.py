@@ -3,7 +3,9 @@ import subprocess
 import random
 import re
 import json
+import threading
 from pathlib import Path
+from siem.shipper import LogTail
 
 
 class CowrieManager:
@@ -15,6 +17,12 @@ class CowrieManager:
         self.ssh_config_file = Path("/etc/ssh/sshd_config")
         self.cowrie_port = 2222 # Cowrie needs to listen on port 2222
         self.default_install_path = Path("/opt/cowrie") # Default installation path for Cowrie
+        self.nat_refresh_interval = 30 # Seconds between iptables nat table snapshots
+        self._config_check_cache = None # ((cowrie.cfg path, sshd_config mtime, cowrie.cfg mtime), result)
+        self._nat_rules = None # Parsed rules from the last `iptables-save -t nat` snapshot
+        self._nat_stop = threading.Event()
+        self._nat_error = None # Last iptables-save failure, printed once until it changes
+        self._log_tail = LogTail(self._log_file, self._to_log)
         
         # If a path is provided, use it
         if cowrie_path:
@@ -26,6 +34,10 @@ class CowrieManager:
             if detected_path:
                 self.cowrie_path = detected_path
                 self.config_file = self.cowrie_path / "etc" / "cowrie.cfg"
+
+        # Periodic iptables snapshot so status requests never shell out
+        self._nat_thread = threading.Thread(target=self._nat_snapshot_loop, daemon=True)
+        self._nat_thread.start()
         
     def _detect_cowrie_installation(self):
         """
@@ -168,35 +180,48 @@ class CowrieManager:
     def _is_properly_configured(self):
         """Checks if Cowrie is configured to listen on port 2222"""
         """Also checks for ssh redirection and iptables rule"""
-        if not self.config_file.exists():
+        if self.config_file is None or not self.config_file.exists():
             return False
-        
-        # Check for ssh redirection
+
+        # sshd_config + cowrie.cfg checks, cached until one of them changes
+        if not self._config_files_ok():
+            return False
+
+        # iptables rule, read from the periodic snapshot (no subprocess per status call)
+        return self._has_redirect_rule()
+
+    def _config_files_ok(self):
+        """Checks sshd_config and cowrie.cfg, caching the result by file mtime"""
+        try:
+            ssh_mtime = self.ssh_config_file.stat().st_mtime_ns
+            cfg_mtime = self.config_file.stat().st_mtime_ns
+        except Exception as e:
+            print(f"[-] Error checking configuration files: {e}")
+            return False
+
+        key = (str(self.config_file), ssh_mtime, cfg_mtime)
+        if self._config_check_cache and self._config_check_cache[0] == key:
+            return self._config_check_cache[1]
+
+        result = self._check_ssh_config() and self._check_cowrie_config()
+        self._config_check_cache = (key, result)
+        return result
+
+    def _check_ssh_config(self):
+        """Checks that the real SSH is not listening on port 22"""
         try:
             with open(self.ssh_config_file, 'r') as f:
                 ssh_content = f.read()
                 port = re.search(r'^Port\s+(\d+)', ssh_content, flags=re.MULTILINE)
                 if port.group(1) == '22':
                     return False
+            return True
         except Exception as e:
             print(f"[-] Error checking SSH configuration: {e}")
             return False
 
-        # Check for iptables rule
-        try:
-            result = subprocess.run(
-                "iptables -L PREROUTING -t nat",
-                shell=True,
-                capture_output=True,
-                text=True
-            )
-        except Exception as e:
-            print(f"[-] Error checking iptables rules: {e}")
-            return False
-        if "tcp dpt:ssh redir ports 2222" not in result.stdout:
-            return False
-        
-        # Checks for Cowrie listening on port 2222
+    def _check_cowrie_config(self):
+        """Checks for Cowrie listening on port 2222"""
         try:
             with open(self.config_file, 'r') as f:
                 content = f.read()
@@ -220,6 +245,82 @@ class CowrieManager:
         except Exception as e:
             print(f"[-] Error checking Cowrie configuration: {e}")
             return False
+
+    def _has_redirect_rule(self):
+        """Looks for the port 22 -> 2222 REDIRECT rule in the last nat table snapshot"""
+        if self._nat_rules is None:
+            self._refresh_nat_rules()
+
+        for rule in self._nat_rules or []:
+            if (rule.get("chain") == "PREROUTING"
+                    and rule.get("protocol") == "tcp"
+                    and rule.get("dport") in ("22", "ssh")
+                    and rule.get("target") == "REDIRECT"
+                    and rule.get("to_ports") == str(self.cowrie_port)):
+                return True
+        return False
+
+    def _refresh_nat_rules(self):
+        """Takes a new `iptables-save -t nat` snapshot and parses it into structured rules"""
+        try:
+            result = subprocess.run(
+                ["iptables-save", "-t", "nat"],
+                capture_output=True,
+                text=True,
+                timeout=10
+            )
+            rules = self._parse_iptables_save(result.stdout) if result.returncode == 0 else []
+        except Exception as e:
+            if str(e) != self._nat_error:
+                print(f"[-] Error checking iptables rules: {e}")
+            self._nat_error = str(e)
+            rules = []
+        else:
+            self._nat_error = None
+        self._nat_rules = rules
+        return rules
+
+    def _parse_iptables_save(self, output):
+        """Parses `-A` lines of iptables-save output into dicts"""
+        options = {
+            "-p": "protocol",
+            "--protocol": "protocol",
+            "--dport": "dport",
+            "--destination-port": "dport",
+            "-j": "target",
+            "--jump": "target",
+            "--to-ports": "to_ports",
+            "--to-port": "to_ports",
+            "-i": "in_iface",
+            "--in-interface": "in_iface"
+        }
+        rules = []
+        for line in output.splitlines():
+            if not line.startswith("-A "):
+                continue
+            tokens = line.split()
+            rule = {"chain": tokens[1], "raw": line}
+            for i in range(2, len(tokens) - 1):
+                if tokens[i] in options:
+                    rule[options[tokens[i]]] = tokens[i + 1]
+            rules.append(rule)
+        return rules
+
+    def _nat_snapshot_loop(self):
+        """Refreshes the nat table snapshot every `nat_refresh_interval` seconds
+
+        While iptables-save fails (e.g. not installed) the interval doubles, up to 10 minutes.
+        """
+        delay = self.nat_refresh_interval
+        while not self._nat_stop.is_set():
+            self._refresh_nat_rules()
+            delay = min(delay * 2, 600) if self._nat_error else self.nat_refresh_interval
+            self._nat_stop.wait(delay)
+
+    def close(self):
+        """Stops the nat table snapshot thread"""
+        self._nat_stop.set()
+        self._nat_thread.join(timeout=15)
     
     def _get_status_message(self, running, configured):
         """Generates a human-readable status message"""
@@ -455,6 +556,7 @@ class CowrieManager:
                     "message": "Error configuring iptables rule",
                     "error": iptables_result.stderr
                 }
+            self._refresh_nat_rules()
             
             return {
                 "success": True,
@@ -670,6 +772,7 @@ class CowrieManager:
                 "-p", "tcp", "--dport", "22",
                 "-j", "REDIRECT", "--to-port", "2222"
             ], capture_output=True, text=True)
+            self._refresh_nat_rules()
             
             # Restore SSH to port 22
             with open(self.ssh_config_file, 'r') as f:
@@ -722,24 +825,7 @@ class CowrieManager:
                                 log_entry = json.loads(line)
                                 if timestamp and log_entry.get('timestamp', '') < timestamp:
                                     continue
-                                # Only include relevant fields in original order
-                                filtered_log_entry = {
-                                    "honeypot" : 'cowrie',
-                                    "eventid": log_entry.get('eventid'),
-                                    "timestamp": log_entry.get('timestamp')[:-8], # not showing miliseconds and timezone
-                                    "src_ip": log_entry.get('src_ip'),
-                                    "src_port": log_entry.get('src_port'),
-                                    "username": log_entry.get('username'),
-                                    "password": log_entry.get('password'),
-                                    "duration": log_entry.get('duration'),
-                                    "message": log_entry.get('message')
-                                }
-                                # If a field is missing, do not show it
-                                for key in list(filtered_log_entry.keys()):
-                                    if filtered_log_entry[key] is None:
-                                        del filtered_log_entry[key]
-
-                                logs.append(filtered_log_entry)
+                                logs.append(self._to_log(log_entry))
                                 counter += 1
                                 if counter >= limit:
                                     break
@@ -757,4 +843,41 @@ class CowrieManager:
             return {
                 "success": False,
                 "message": f"Error retrieving logs: {str(e)}"
-            }
\ No newline at end of file
+            }
+
+    @staticmethod
+    def _to_log(log_entry):
+        """Keeps the relevant fields of a cowrie.json event"""
+        # Only include relevant fields in original order
+        filtered_log_entry = {
+            "honeypot" : 'cowrie',
+            "eventid": log_entry.get('eventid'),
+            "timestamp": log_entry.get('timestamp')[:-8], # not showing miliseconds and timezone
+            "src_ip": log_entry.get('src_ip'),
+            "src_port": log_entry.get('src_port'),
+            "username": log_entry.get('username'),
+            "password": log_entry.get('password'),
+            "duration": log_entry.get('duration'),
+            "message": log_entry.get('message')
+        }
+        # If a field is missing, do not show it
+        for key in list(filtered_log_entry.keys()):
+            if filtered_log_entry[key] is None:
+                del filtered_log_entry[key]
+        return filtered_log_entry
+
+    def _log_file(self):
+        """Path of the current cowrie.json, None if Cowrie was not found
+
+        Called on every shipper poll, so it does not run is_installed()'s filesystem search.
+        """
+        if self.cowrie_path is None:
+            return None
+        return self.cowrie_path / "var" / "log" / "cowrie" / "cowrie.json"
+
+    def get_new_logs(self, checkpoint, limit):
+        """Events appended to cowrie.json since `checkpoint`, used to ship them to a SIEM
+
+        Returns (logs, checkpoint), rotated logs are read to the end before the new file.
+        """
+        return self._log_tail(checkpoint, limit)
@@ -4,19 +4,121 @@ import random
 import re
 import json
 import sqlite3
+import queue
+import threading
+import time
+from contextlib import contextmanager, closing
 from pathlib import Path
 from datetime import datetime
+from functools import lru_cache
 import ipaddress
+import socket
+import struct
+
+
+@lru_cache(maxsize=4096) # Repeat attackers/targets show up in most pages
+def _ip_int_to_str(ip_int):
+    """Convert IP from int32 to string"""
+    return socket.inet_ntoa(struct.pack("!I", ip_int))
+
 
 class DDoSPotManager:
     """DDoSPot Honeypot Manager"""
 
+    # Response/request size ratio, for protocols where DDoSPot does not store it
+    SIZE_AMPLIFICATION = "CASE WHEN a.request_size != 0 THEN ROUND(CAST(a.response_size AS REAL) / a.request_size, 2) ELSE 0 END"
+
+    # Per-protocol columns/joins, normalised to LOG_COLUMNS so protocols can be UNION-ed ({db} = schema prefix)
+    # `fields` are the protocol specific fields of its log entries
+    LOG_SOURCES = {
+        "dnspot": {
+            "name": "dns",
+            "columns": {"amplification": "a.amplification", "domain_name": "d.domain_name", "dns_type": "d.dns_type"},
+            "joins": "JOIN {db}dnspot_domains d ON a.domain_id = d.id",
+            "fields": ("domain_name", "dns_type")
+        },
+        "ntpot": {
+            "name": "ntp",
+            "columns": {"amplification": SIZE_AMPLIFICATION, "request_size": "a.request_size", "response_size": "a.response_size", "mode": "a.mode"},
+            "fields": ("mode",)
+        },
+        "genericpot": {
+            "name": "snmp",
+            "columns": {"amplification": SIZE_AMPLIFICATION, "request_size": "a.request_size", "response_size": "a.response_size", "dst_port": "a.dst_port"},
+            "fields": ("dst_port",)
+        },
+        "ssdpot": {
+            "name": "ssdp",
+            "columns": {"amplification": SIZE_AMPLIFICATION, "request_size": "a.request_size", "response_size": "a.response_size", "st": "a.st", "mx": "a.mx"},
+            "fields": ("st", "mx")
+        },
+        "chargenpot": {
+            "name": "chargen",
+            "columns": {"amplification": SIZE_AMPLIFICATION, "request_size": "a.request_size", "response_size": "a.response_size"},
+            "fields": ()
+        }
+    }
+    LOG_COLUMNS = ("amplification", "request_size", "response_size", "mode", "dst_port", "st", "mx", "domain_name", "dns_type")
+
+    # Severity heuristics, evaluated in SQL for every row of the result at once:
+    #   severity = max(min(base + number of true bumps, high), every true floor)
+    # base: first matching (condition, level) or `default` (None = unknown, never bumped)
+    # bumps: raise severity one level each, floors: minimum level when the condition holds
+    # Number of packets = scan or attack (10 max due to default DDoSPot blacklist)
+    SEVERITY_LEVELS = ("low", "medium", "high")
+    SEVERITY_RULES = {
+        "dnspot": {
+            "base": [("{amplification} >= 10", "high"), ("{amplification} >= 5", "medium")],
+            "default": "low",
+            "bumps": ["{count} >= 8"],
+            "floors": [("{count} >= 5", "medium")]
+        },
+        "ntpot": {
+            "base": [
+                ("{mode} = 7", "high"), # monlist (obsolete but highly abused)
+                ("{mode} = 6 AND {amplification} >= 10", "high"), # control message (can be abused for reflection)
+                ("{mode} = 6", "medium"),
+                ("{mode} = 3 AND {amplification} > 1", "medium"), # client mode (low risk)
+                ("{mode} = 3", "low")
+            ],
+            "default": None,
+            "bumps": ["{count} >= 8"],
+            "floors": [("{count} >= 5", "medium")]
+        },
+        "genericpot": {
+            "base": [("{amplification} >= 10", "high"), ("{amplification} >= 5", "medium")],
+            "default": "low",
+            "bumps": ["{count} >= 8"],
+            "floors": [("{count} >= 5", "medium")]
+        },
+        "ssdpot": {
+            # st = ssdp:all requests for every device, low mx = short response time
+            "base": [("{st} = 'ssdp:all' OR {amplification} >= 10", "high"), ("{amplification} >= 5", "medium")],
+            "default": "low",
+            "bumps": ["{mx} <= 2", "{count} >= 8"],
+            "floors": [("{count} >= 5", "medium")]
+        },
+        "chargenpot": {
+            "base": [("{amplification} >= 5", "high")],
+            "default": "low",
+            "bumps": [],
+            "floors": [("{count} >= 8", "high"), ("{count} >= 3", "medium")]
+        }
+    }
+    NTP_MODES = {7: "monlist", 6: "control", 3: "client"}
+
     def __init__(self):
         self.container_name = "honeydash-ddospot"
         self.data_dir = Path("/opt/honeydash/ddospot-data")
         self.logs_dir = Path("/opt/honeydash/ddospot-data/logs")
         self.db_dir = Path("/opt/honeydash/ddospot-data/db")
         self.install_path = Path("/opt/ddospot") # Installation path for DDoSPot
+        self.pool_size = 8 # Max idle read-only connections kept per protocol database
+        self._pools = {} # protocol -> LifoQueue of read-only sqlite3 connections
+        self.rollup_db = self.data_dir / "honeydash-rollups.sqlite3" # HoneyDash's own summary database
+        self.rollup_refresh_interval = 30 # Min seconds between rollup refreshes
+        self._rollup_lock = threading.Lock()
+        self._rollup_refreshed = 0
         docker_installed = self._detect_docker_installation()
         ddospot_container = self._detect_container()
         if not docker_installed:
@@ -302,12 +404,452 @@ class DDoSPotManager:
                 "message": f"Error stopping DDoSPot: {str(e)}"
             }
     
-    def _ip_int_to_str(self, ip_int):
-        """Convert IP from int32 to string"""
-        return str(ipaddress.IPv4Address(ip_int))
+    def _open_readonly(self, db_path, attach=None):
+        """Opens a read-only connection that never takes write locks on DDoSPot's database
+
+        Args:
+            db_path: Main database, or None for an empty in-memory one
+            attach: Optional {schema: db_path} databases ATTACHed read-only
+        """
+        conn = sqlite3.connect(
+            f"file:{db_path}?mode=ro" if db_path else "file::memory:",
+            uri=True,
+            isolation_level=None, # autocommit: no implicit transactions holding read locks
+            check_same_thread=False, # connections are shared across Flask threads through the pool
+            cached_statements=64
+        )
+        for schema, path in (attach or {}).items():
+            conn.execute(f"ATTACH DATABASE ? AS {schema}", (f"file:{path}?mode=ro",))
+        conn.execute("PRAGMA query_only = ON")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @contextmanager
+    def _connection(self, key, db_path, attach=None):
+        """Borrows a read-only connection for `key` from its pool, returning it afterwards"""
+        pool = self._pools.setdefault(key, queue.LifoQueue(maxsize=self.pool_size))
+        try:
+            conn = pool.get_nowait()
+        except queue.Empty:
+            conn = self._open_readonly(db_path, attach)
+
+        returned = False
+        try:
+            yield conn
+            try:
+                pool.put_nowait(conn)
+                returned = True
+            except queue.Full:
+                pass
+        finally:
+            if not returned:
+                # Full pool, or the caller failed: the connection may be broken (e.g. database
+                # replaced) or mid-statement, do not return it to the pool
+                conn.close()
+
+    def _drain_pool(self, pool):
+        """Closes the idle connections of a pool"""
+        while True:
+            try:
+                pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def close(self):
+        """Closes every pooled database connection"""
+        for pool in self._pools.values():
+            self._drain_pool(pool)
+        self._pools.clear()
+
+    def create_indexes(self, protocol=None):
+        """Creates HoneyDash indexes on DDoSPot attack tables (opt-in, written into DDoSPot's own database files)
+
+        Args:
+            protocol: Only index this protocol database (default: every existing one)
+        """
+        protocols = [protocol] if protocol else list(self.LOG_SOURCES)
+        created = {}
+        try:
+            for proto in protocols:
+                if proto not in self.LOG_SOURCES:
+                    return {
+                        "success": False,
+                        "message": f"Unknown protocol: {proto}"
+                    }
+                db_path = self.db_dir / f"{proto}.sqlite3"
+                if not db_path.exists():
+                    continue
+
+                # Read-write connection, waits for DDoSPot's writer instead of failing
+                conn = sqlite3.connect(str(db_path), timeout=30)
+                try:
+                    # start: ORDER BY / keyset / timestamp filter, src_id: per-source lookups,
+                    # latest: rollup refresh watermark
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS honeydash_{proto}_start ON {proto}_attack(start)")
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS honeydash_{proto}_src_start ON {proto}_attack(src_id, start)")
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS honeydash_{proto}_latest ON {proto}_attack(latest)")
+                    conn.execute("ANALYZE")
+                    conn.commit()
+                finally:
+                    conn.close()
+                if proto in self._pools:
+                    # Pooled connections keep the schema they read, reconnect to plan with the indexes
+                    self._drain_pool(self._pools[proto])
+                created[proto] = [f"honeydash_{proto}_start", f"honeydash_{proto}_src_start", f"honeydash_{proto}_latest"]
+
+            return {
+                "success": True,
+                "message": f"Indexes created for {len(created)} database(s)",
+                "indexes": created
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"Error creating DDoSPot indexes: {str(e)}",
+                "indexes": created
+            }
+
+    def get_index_report(self):
+        """EXPLAIN QUERY PLAN of every log query shape, showing which ones are index-assisted"""
+        report = {}
+        try:
+            for proto in self.LOG_SOURCES:
+                db_path = self.db_dir / f"{proto}.sqlite3"
+                if not db_path.exists():
+                    continue
+
+                # Query shapes issued by get_logs: first page, timestamp filter, next page, subnet filter
+                variants = {
+                    "first_page": (None, None, None),
+                    "timestamp": ("1970-01-01 00:00:00", None, None),
+                    "next_page": (None, f"9999-12-31 23:59:59|{proto}|0", None),
+                    "cidr": (None, None, self._cidr_range("192.0.2.0/24"))
+                }
+                queries = []
+                # Fresh connection, so indexes created since the pool opened are in the plans
+                with closing(self._open_readonly(db_path)) as conn:
+                    for name, (timestamp, cursor, cidr) in variants.items():
+                        query, params = self._build_logs_query(proto, 50, timestamp, cursor, cidr)
+                        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params)]
+                        # Full scan of the attack table or a temp sort means the query is not indexed
+                        full_scan = any(d.startswith("SCAN a") and "USING" not in d for d in plan)
+                        temp_sort = any("TEMP B-TREE" in d for d in plan)
+                        queries.append({
+                            "query": name,
+                            "plan": plan,
+                            "indexed": not full_scan and not temp_sort
+                        })
+                report[proto] = queries
+
+            return {
+                "success": True,
+                "report": report
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"Error building DDoSPot index report: {str(e)}",
+                "report": report
+            }
+
+    def _open_rollups(self):
+        """Opens HoneyDash's rollup database, creating its tables if needed"""
+        conn = sqlite3.connect(str(self.rollup_db), timeout=30)
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS attack_rollups (
+                protocol TEXT NOT NULL,
+                bucket TEXT NOT NULL, -- minute: YYYY-MM-DD HH:MM:00
+                attacks INTEGER NOT NULL,
+                packets INTEGER NOT NULL,
+                bytes INTEGER, -- reflected bytes (count * response_size), NULL for DNS
+                max_amplification REAL,
+                PRIMARY KEY (protocol, bucket)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS attack_rollups_bucket ON attack_rollups(bucket);
+            CREATE TABLE IF NOT EXISTS target_rollups (
+                protocol TEXT NOT NULL,
+                bucket TEXT NOT NULL, -- hour: YYYY-MM-DD HH:00:00
+                src_ip INTEGER NOT NULL, -- reflection target (spoofed source)
+                attacks INTEGER NOT NULL,
+                packets INTEGER NOT NULL,
+                PRIMARY KEY (protocol, bucket, src_ip)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS target_rollups_bucket ON target_rollups(bucket);
+            CREATE TABLE IF NOT EXISTS rollup_watermarks (
+                protocol TEXT PRIMARY KEY,
+                latest TEXT NOT NULL -- highest attack `latest` already rolled up
+            );
+        """)
+        return conn
+
+    def refresh_rollups(self, force=False):
+        """Incrementally refreshes the rollups of every protocol database
+
+        Only attacks whose `latest` is at or past the protocol's watermark (new or still ongoing
+        attacks) are looked at: their buckets, from the hour of the oldest one onwards,
+        are aggregated again and replaced. Attacks at the watermark are included since
+        timestamps have one second resolution, DDoSPot may have written more in that second.
+        """
+        with self._rollup_lock:
+            if not force and time.monotonic() - self._rollup_refreshed < self.rollup_refresh_interval:
+                return
+            with closing(self._open_rollups()) as rollups:
+                for proto, source in self.LOG_SOURCES.items():
+                    db_path = self.db_dir / f"{proto}.sqlite3"
+                    if db_path.exists():
+                        self._refresh_protocol_rollups(rollups, proto, source, db_path)
+            self._rollup_refreshed = time.monotonic()
+
+    def _refresh_protocol_rollups(self, rollups, proto, source, db_path):
+        """Refreshes the rollups of one protocol (see refresh_rollups)"""
+        row = rollups.execute("SELECT latest FROM rollup_watermarks WHERE protocol = ?", (proto,)).fetchone()
+        watermark = row[0] if row else None
+
+        amplification = source["columns"]["amplification"]
+        reflected = "a.count * a.response_size" if "response_size" in source["columns"] else "NULL"
+
+        with self._connection(proto, db_path) as conn:
+            # Single read snapshot, DDoSPot may be updating attacks meanwhile
+            conn.execute("BEGIN")
+            try:
+                if watermark is None:
+                    since = None
+                    new_watermark = conn.execute(f"SELECT MAX(a.latest) FROM {proto}_attack a").fetchone()[0]
+                    if new_watermark is None:
+                        return
+                else:
+                    oldest, new_watermark = conn.execute(
+                        f"SELECT MIN(a.start), MAX(a.latest) FROM {proto}_attack a WHERE a.latest >= ?",
+                        (watermark,)
+                    ).fetchone()
+                    if oldest is None:
+                        return
+                    since = oldest[:13] + ":00:00"
+
+                where = " WHERE a.start >= ?" if since else ""
+                params = (since,) if since else ()
+                buckets = conn.execute(
+                    f"SELECT substr(a.start, 1, 16) || ':00' AS bucket, COUNT(*), SUM(a.count), SUM({reflected}), MAX({amplification})"
+                    f" FROM {proto}_attack a{where} GROUP BY bucket",
+                    params
+                ).fetchall()
+                targets = conn.execute(
+                    f"SELECT substr(a.start, 1, 13) || ':00:00' AS bucket, a.src_id, COUNT(*), SUM(a.count)"
+                    f" FROM {proto}_attack a{where} GROUP BY bucket, a.src_id",
+                    params
+                ).fetchall()
+            finally:
+                conn.execute("COMMIT")
+
+        with rollups:
+            if since:
+                rollups.execute("DELETE FROM attack_rollups WHERE protocol = ? AND bucket >= ?", (proto, since))
+                rollups.execute("DELETE FROM target_rollups WHERE protocol = ? AND bucket >= ?", (proto, since))
+            else:
+                rollups.execute("DELETE FROM attack_rollups WHERE protocol = ?", (proto,))
+                rollups.execute("DELETE FROM target_rollups WHERE protocol = ?", (proto,))
+            rollups.executemany(
+                "INSERT INTO attack_rollups VALUES (?, ?, ?, ?, ?, ?)",
+                ((proto, *tuple(b)) for b in buckets)
+            )
+            rollups.executemany(
+                "INSERT INTO target_rollups VALUES (?, ?, ?, ?, ?)",
+                ((proto, *tuple(t)) for t in targets)
+            )
+            rollups.execute(
+                "INSERT INTO rollup_watermarks VALUES (?, ?) ON CONFLICT(protocol) DO UPDATE SET latest = excluded.latest",
+                (proto, new_watermark)
+            )
+
+    def get_histogram(self, protocol, interval, timestamp_from, timestamp_to, top):
+        """Attack volume per protocol and time bucket plus top reflection targets, served from rollups
+
+        Args:
+            protocol: DDoSPot database or "all"
+            interval: Bucket size: minute, hour or day
+            timestamp_from: Range start (optional)
+            timestamp_to: Range end (optional)
+            top: Number of top targets to return
+        """
+        # Length of the bucket prefix kept for each interval and the suffix completing it
+        intervals = {"minute": (16, ":00"), "hour": (13, ":00:00"), "day": (10, " 00:00:00")}
+        try:
+            if interval not in intervals:
+                return {
+                    "success": False,
+                    "message": f"Unknown interval: {interval}"
+                }
+            if protocol != "all" and protocol not in self.LOG_SOURCES:
+                return {
+                    "success": False,
+                    "message": f"Unknown protocol: {protocol}"
+                }
+
+            self.refresh_rollups()
+
+            # datetime-local inputs use a "T" separator
+            timestamp_from = (timestamp_from or "0000-01-01 00:00:00").replace("T", " ")
+            timestamp_to = (timestamp_to or "9999-12-31 23:59:59").replace("T", " ")
+            length, suffix = intervals[interval]
+
+            conditions = "bucket >= ? AND bucket <= ?"
+            params = [timestamp_from[:16], timestamp_to]
+            target_params = [timestamp_from[:13], timestamp_to]
+            if protocol != "all":
+                conditions += " AND protocol = ?"
+                params.append(protocol)
+                target_params.append(protocol)
+
+            with closing(self._open_rollups()) as rollups:
+                buckets = rollups.execute(
+                    f"SELECT protocol, substr(bucket, 1, {length}) || '{suffix}' AS period,"
+                    f" SUM(attacks), SUM(packets), SUM(bytes), MAX(max_amplification)"
+                    f" FROM attack_rollups WHERE {conditions} GROUP BY protocol, period ORDER BY period, protocol",
+                    params
+                ).fetchall()
+                targets = rollups.execute(
+                    f"SELECT src_ip, SUM(attacks), SUM(packets) AS total, group_concat(DISTINCT protocol)"
+                    f" FROM target_rollups WHERE {conditions} GROUP BY src_ip ORDER BY total DESC LIMIT ?",
+                    target_params + [top]
+                ).fetchall()
+
+            return {
+                "success": True,
+                "interval": interval,
+                "buckets": [{
+                    "protocol": self.LOG_SOURCES[proto]["name"],
+                    "bucket": period,
+                    "attacks": attacks,
+                    "packets": packets,
+                    "bytes": reflected,
+                    "max_amplification": max_amplification
+                } for proto, period, attacks, packets, reflected, max_amplification in buckets],
+                "top_targets": [{
+                    "src_ip": src_ip,
+                    "attacks": attacks,
+                    "packets": packets,
+                    "protocols": [self.LOG_SOURCES[p]["name"] for p in protocols.split(",")]
+                } for src_ip, (_, attacks, packets, protocols) in zip(self._ips_to_str([t[0] for t in targets]), targets)]
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"Error reading DDoSPot rollups: {str(e)}"
+            }
+
+    def _ips_to_str(self, ip_ints):
+        """Converts a column of int32 IPs to strings, each distinct IP only once"""
+        strings = {ip_int: _ip_int_to_str(ip_int) for ip_int in set(ip_ints)}
+        return [strings[ip_int] for ip_int in ip_ints]
+
+    def _cidr_range(self, cidr):
+        """First and last int32 address of an IPv4 CIDR (e.g. 192.0.2.0/24)"""
+        network = ipaddress.IPv4Network(cidr, strict=False)
+        return int(network.network_address), int(network.broadcast_address)
     
-    def get_logs(self, limit, protocol, timestamp):
-        """Get DDoSPot attack logs from SQLite database"""
+    def _severity_sql(self, protocol, columns):
+        """Builds the SQL expression scoring a row of `protocol` from SEVERITY_RULES"""
+        rules = self.SEVERITY_RULES[protocol]
+        names = dict(columns, count="a.count")
+        level = self.SEVERITY_LEVELS.index
+
+        base = "CASE " + " ".join(
+            f"WHEN {condition.format(**names)} THEN {level(severity)}" for condition, severity in rules["base"]
+        )
+        base += f" ELSE {'NULL' if rules['default'] is None else level(rules['default'])} END"
+
+        score = f"({base})"
+        for bump in rules["bumps"]:
+            score += f" + ({bump.format(**names)})"
+        score = f"MIN({score}, {len(self.SEVERITY_LEVELS) - 1})"
+        if rules["floors"]:
+            floors = ", ".join(f"({condition.format(**names)}) * {level(severity)}" for condition, severity in rules["floors"])
+            score = f"MAX({score}, {floors})"
+
+        labels = " ".join(f"WHEN {i} THEN '{name}'" for i, name in enumerate(self.SEVERITY_LEVELS))
+        # NULL base (unknown) propagates through MIN/MAX
+        return f"CASE {score} {labels} ELSE 'unknown' END"
+
+    def _select_logs(self, protocol, schema=""):
+        """SELECT of one protocol's attacks with the normalised LOG_COLUMNS layout and its severity"""
+        source = self.LOG_SOURCES[protocol]
+        db = f"{schema}." if schema else ""
+        sql_columns = {column: source["columns"].get(column, "NULL") for column in self.LOG_COLUMNS}
+        columns = ", ".join(f"{expression} AS {column}" for column, expression in sql_columns.items())
+        return (
+            f"SELECT '{protocol}' AS source, s.src_ip, s.src_port, a.start, a.latest, a.count, {columns},"
+            f" {self._severity_sql(protocol, sql_columns)} AS severity, a.rowid AS row_id"
+            f" FROM {db}{protocol}_attack a"
+            f" JOIN {db}{protocol}_sources s ON a.src_id = s.src_ip "
+            + source.get("joins", "").format(db=db)
+        )
+
+    def _build_logs_query(self, protocols, limit, timestamp, cursor, cidr=None):
+        """Builds a fully parameterised keyset query (newest first) over one or several protocols
+
+        Several protocols are read from their ATTACHed schemas and merged with UNION ALL, each
+        branch limited on its own so every database only reads one page from its `start` index.
+        The statement text only depends on which filters are present, so sqlite3's statement
+        cache reuses it across requests and pages.
+        """
+        if isinstance(protocols, str):
+            protocols = [protocols]
+        multiple = len(protocols) > 1
+
+        cursor_start = cursor_source = cursor_rowid = None
+        if cursor:
+            # cursor = "<start>|<protocol>|<rowid>" of the last row of the previous page
+            cursor_start, cursor_source, cursor_rowid = cursor.rsplit("|", 2)
+
+        branches = []
+        params = []
+        for protocol in protocols:
+            conditions = []
+            if timestamp:
+                conditions.append("a.start >= ?")
+                params.append(timestamp)
+            if cidr:
+                # src_id is the source IP as int32, so a subnet is a range (src_id index)
+                conditions.append("a.src_id BETWEEN ? AND ?")
+                params.extend(cidr)
+            if cursor:
+                # Order is start DESC, protocol DESC, rowid DESC. Leading `a.start <= ?`/`a.start < ?`
+                # lets SQLite seek the start index instead of scanning it
+                if protocol == cursor_source:
+                    conditions.append("a.start <= ? AND (a.start < ? OR a.rowid < ?)")
+                    params.extend([cursor_start, cursor_start, int(cursor_rowid)])
+                elif protocol < cursor_source:
+                    conditions.append("a.start <= ?")
+                    params.append(cursor_start)
+                else:
+                    conditions.append("a.start < ?")
+                    params.append(cursor_start)
+
+            branch = self._select_logs(protocol, protocol if multiple else "")
+            if conditions:
+                branch += " WHERE " + " AND ".join(conditions)
+            branch += " ORDER BY a.start DESC, a.rowid DESC LIMIT ?"
+            params.append(limit + 1)
+            branches.append(branch)
+
+        if not multiple:
+            return branches[0], params
+
+        query = " UNION ALL ".join(f"SELECT * FROM ({branch})" for branch in branches)
+        query += " ORDER BY start DESC, source DESC, row_id DESC LIMIT ?"
+        params.append(limit + 1)
+        return query, params
+
+    def get_logs(self, limit, protocol, timestamp, cursor=None, cidr=None):
+        """Get DDoSPot attack logs from SQLite database
+
+        Args:
+            limit: Max number of logs per page
+            protocol: DDoSPot database (dnspot, ntpot, genericpot, ssdpot, chargenpot) or "all"
+            timestamp: Only attacks started at or after this time
+            cursor: `cursor_next` value returned by the previous page
+            cidr: Only attacks from this IPv4 subnet (e.g. 192.0.2.0/24)
+        """
         try:
             if not self.is_installed():
                 return {
@@ -315,293 +857,81 @@ class DDoSPotManager:
                     "message": "DDoSPot is not installed",
                     "logs": []
                 }
-            
-            db_path = self.db_dir / f"{protocol}.sqlite3"
-            
-            if not db_path.exists():
+            if limit < 1:
                 return {
                     "success": False,
-                    "message": f"Database not found: {db_path}",
+                    "message": "Limit must be 1 or more",
                     "logs": []
                 }
-            
-            conn = sqlite3.connect(str(db_path))
-            cursor = conn.cursor()
-
-            if protocol == 'dnspot':
-                query = """
-                SELECT s.src_ip, s.src_port, d.domain_name, d.dns_type, a.start, a.latest, a.count, a.amplification
-                FROM dnspot_attack a
-                JOIN dnspot_sources s ON a.src_id = s.src_ip
-                JOIN dnspot_domains d ON a.domain_id = d.id
-                """
-                if timestamp:
-                    query += f" WHERE a.start >= '{timestamp}'"
-                query += " ORDER BY a.start DESC LIMIT ?"
-                
-                cursor.execute(query, (limit,))
-                rows = cursor.fetchall()
-                
-                logs = []
-                for row in rows:
-                    # Severity field heuristic
-                    if row[7] >= 10:
-                        severity = "high"
-                    elif row[7] >= 5:
-                        severity = "medium"
-                    else:
-                        severity = "low"
-
-                    # Number of packets = scan or attack (10 max due to default DDoSPot blacklist)
-                    if row[6] >= 8:
-                        if severity == "low":
-                            severity = "medium"
-                        elif severity == "medium":
-                            severity = "high"
-                    elif row[6] >= 5:
-                        if severity == "low":
-                            severity = "medium"
-
-                    logs.append({
-                        "honeypot": "ddospot",
-                        "protocol": "dns",
-                        "src_ip": self._ip_int_to_str(row[0]),
-                        "src_port": row[1],
-                        "domain_name": row[2],
-                        "dns_type": row[3],
-                        "attack_start": row[4],
-                        "attack_end": row[5],
-                        "packet_count": row[6],
-                        "amplification_factor": row[7],
-                        "severity": severity
-                    })
-            
-            elif protocol == 'ntpot':
-                query = """
-                SELECT s.src_ip, s.src_port, a.mode, a.start, a.latest, a.count, a.request_size, a.response_size
-                FROM ntpot_attack a
-                JOIN ntpot_sources s ON a.src_id = s.src_ip
-                """
-                if timestamp:
-                    query += f" WHERE a.start >= '{timestamp}'"
-                query += " ORDER BY a.start DESC LIMIT ?"
-
-                cursor.execute(query, (limit,))
-                rows = cursor.fetchall()
-    
-                logs = []
-                for row in rows:
-                    # Amplification factor calculation
-                    if row[6] != 0:
-                        amplification = round(row[7] / row[6], 2)
-                    else:
-                        amplification = 0
-
-                    # Severity field heuristic
-                    mode = row[2]
-                    severity = "unknown"
-                    if mode == 7: # monlist (obsolete but highly abused)
-                        severity = "high"
-                        mode = "7 (monlist)"
-                    elif mode == 6: # control message (can be abused for reflection)
-                        if amplification >= 10:
-                            severity = "high"
-                        else:
-                            severity = "medium"
-                        mode = "6 (control)"
-                    elif mode == 3: # client mode (low risk)
-                        if amplification > 1:
-                            severity = "medium"
-                        else:
-                            severity = "low"
-                        mode = "3 (client)"
-                    else:
-                        mode = f"{mode} (unknown)"
-
-                    # Number of packets = scan or attack (10 max due to default DDoSPot blacklist)
-                    if row[5] >= 8:
-                        if severity == "low":
-                            severity = "medium"
-                        elif severity == "medium":
-                            severity = "high"
-                    elif row[5] >= 5:
-                        if severity == "low":
-                            severity = "medium"
-
-                    logs.append({
-                        "honeypot": "ddospot",
-                        "protocol": "ntp",
-                        "src_ip": self._ip_int_to_str(row[0]),
-                        "src_port": row[1],
-                        "mode": mode,
-                        "attack_start": row[3],
-                        "attack_end": row[4],
-                        "packet_count": row[5],
-                        "amplification_factor": amplification,
-                        "severity": severity
-                    })
-
-            elif protocol == 'genericpot': # SNMP
-                query = """
-                SELECT s.src_ip, s.src_port, a.dst_port, a.start, a.latest, a.count, a.request_size, a.response_size
-                FROM genericpot_attack a
-                JOIN genericpot_sources s ON a.src_id = s.src_ip
-                """
-                if timestamp:
-                    query += f" WHERE a.start >= '{timestamp}'"
-                query += " ORDER BY a.start DESC LIMIT ?"
-                
-                cursor.execute(query, (limit,))
-                rows = cursor.fetchall()
-                
-                logs = []
-                for row in rows:
-                    # Amplification factor calculation
-                    if row[6] != 0:
-                        amplification = round(row[7] / row[6], 2)
-                    else:
-                        amplification = 0
-
-                    # Severity field heuristic
-                    if amplification >= 10:
-                        severity = "high"
-                    elif amplification >= 5:
-                        severity = "medium"
-                    else:
-                        severity = "low"
-
-                    # Number of packets = scan or attack (10 max due to default DDoSPot blacklist)
-                    if row[5] >= 8:
-                        if severity == "low":
-                            severity = "medium"
-                        elif severity == "medium":
-                            severity = "high"
-                    elif row[5] >= 5:
-                        if severity == "low":
-                            severity = "medium"
-
-                    logs.append({
-                        "honeypot": "ddospot",
-                        "protocol": "snmp",
-                        "src_ip": self._ip_int_to_str(row[0]),
-                        "src_port": row[1],
-                        "dst_port": row[2],
-                        "attack_start": row[3],
-                        "attack_end": row[4],
-                        "packet_count": row[5],
-                        "amplification_factor": amplification,
-                        "severity": severity
-                    })
-
-            elif protocol == 'ssdpot':
-                query = """
-                SELECT s.src_ip, s.src_port, a.st, a.start, a.latest, a.count, a.request_size, a.response_size, a.mx
-                FROM ssdpot_attack a
-                JOIN ssdpot_sources s ON a.src_id = s.src_ip
-                """
-                if timestamp:
-                    query += f" WHERE a.start >= '{timestamp}'"
-                query += " ORDER BY a.start DESC LIMIT ?"
-                
-                cursor.execute(query, (limit,))
-                rows = cursor.fetchall()
-
-                logs = []
-                for row in rows:
-                    # Amplification factor calculation
-                    if row[6] != 0:
-                        amplification = round(row[7] / row[6], 2)
-                    else:
-                        amplification = 0
-
-                    # Severity field heuristic
-                    severity = "low"
-                    if row[2] == "ssdp:all" or amplification >= 10: # st = ssdp:all requests for every device
-                        severity = "high"
-                    elif amplification >= 5:
-                        severity = "medium"
-                    
-                    if row[8] <= 2: # low mx = short response time
-                        if severity == "medium":
-                            severity = "high"
-                        elif severity == "low":
-                            severity = "medium"
-
-                    # Number of packets = scan or attack (10 max due to default DDoSPot blacklist)
-                    if row[5] >= 8:
-                        if severity == "low":
-                            severity = "medium"
-                        elif severity == "medium":
-                            severity = "high"
-                    elif row[5] >= 5:
-                        if severity == "low":
-                            severity = "medium"
-
-                    logs.append({
-                        "honeypot": "ddospot",
-                        "protocol": "ssdp",
-                        "src_ip": self._ip_int_to_str(row[0]),
-                        "src_port": row[1],
-                        "st": row[2],
-                        "mx": row[8],
-                        "attack_start": row[3],
-                        "attack_end": row[4],
-                        "packet_count": row[5],
-                        "amplification_factor": amplification,
-                        "severity": severity
-                    })
-
-            elif protocol == 'chargenpot':
-                query = """
-                SELECT s.src_ip, s.src_port, a.start, a.latest, a.count, a.request_size, a.response_size
-                FROM chargenpot_attack a
-                JOIN chargenpot_sources s ON a.src_id = s.src_ip
-                """
-                if timestamp:
-                    query += f" WHERE a.start >= '{timestamp}'"
-                query += " ORDER BY a.start DESC LIMIT ?"
-                
-                cursor.execute(query, (limit,))
-                rows = cursor.fetchall()
-                
-                logs = []
-                for row in rows:
-                    # Amplification factor calculation
-                    if row[5] != 0:
-                        amplification = round(row[6] / row[5], 2)
-                    else:
-                        amplification = 0
-
-                    # Severity field heuristic
-                    if amplification >= 5:
-                        severity = "high"
-                    else:
-                        severity = "low"
-
-                    # Number of packets = scan or attack (10 max due to default DDoSPot blacklist)
-                    if row[4] >= 8:
-                        if severity == "low":
-                            severity = "high"
-                    elif row[4] >= 3:
-                        if severity == "low":
-                            severity = "medium"
-
-                    logs.append({
-                        "honeypot": "ddospot",
-                        "protocol": "chargen",
-                        "src_ip": self._ip_int_to_str(row[0]),
-                        "src_port": row[1],
-                        "attack_start": row[2],
-                        "attack_end": row[3],
-                        "packet_count": row[4],
-                        "amplification_factor": amplification,
-                        "severity": severity
-                    })
-            
+
+            if protocol == "all":
+                # Every existing protocol database ATTACHed into a single connection
+                attach = {}
+                for proto in self.LOG_SOURCES:
+                    proto_path = self.db_dir / f"{proto}.sqlite3"
+                    if proto_path.exists():
+                        attach[proto] = proto_path
+                if not attach:
+                    return {
+                        "success": False,
+                        "message": f"No DDoSPot databases found in {self.db_dir}",
+                        "logs": []
+                    }
+                protocols = list(attach)
+                # Pool per set of databases, a new database needs new connections
+                pool_key = "all:" + ",".join(protocols)
+                db_path = None
+            else:
+                if protocol not in self.LOG_SOURCES:
+                    return {
+                        "success": False,
+                        "message": f"Unknown protocol: {protocol}",
+                        "logs": []
+                    }
+
+                db_path = self.db_dir / f"{protocol}.sqlite3"
+
+                if not db_path.exists():
+                    return {
+                        "success": False,
+                        "message": f"Database not found: {db_path}",
+                        "logs": []
+                    }
+                protocols = [protocol]
+                pool_key = protocol
+                attach = None
+
+            if cidr:
+                try:
+                    cidr = self._cidr_range(cidr)
+                except ValueError:
+                    return {
+                        "success": False,
+                        "message": f"Invalid CIDR: {cidr}",
+                        "logs": []
+                    }
+
+            query, params = self._build_logs_query(protocols, limit, timestamp, cursor, cidr)
+            with self._connection(pool_key, db_path, attach) as conn:
+                rows = conn.execute(query, params).fetchall()
+
+            # One extra row was requested to know if there is a next page
+            has_next = len(rows) > limit
+            rows = rows[:limit]
+            cursor_next = None
+            if has_next:
+                last = rows[-1]
+                cursor_next = f"{last['start']}|{last['source']}|{last['row_id']}"
+
+            src_ips = self._ips_to_str([row["src_ip"] for row in rows])
+            logs = [self._to_log(row, src_ip) for row, src_ip in zip(rows, src_ips)]
+
             return {
                 "success": True,
                 "message": f"Found {len(logs)} attack logs",
-                "logs": logs
+                "logs": logs,
+                "has_next": has_next,
+                "cursor_next": cursor_next
             }
             
         except Exception as e:
@@ -609,4 +939,52 @@ class DDoSPotManager:
                 "success": False,
                 "message": f"Error reading DDoSPot logs: {str(e)}",
                 "logs": []
-            }
\ No newline at end of file
+            }
+
+    def get_new_logs(self, checkpoint, limit):
+        """Attacks added since `checkpoint`, used to ship them to a SIEM
+
+        Args:
+            checkpoint: {protocol: last rowid read} returned by the previous call, None at first
+            limit: Max number of logs returned
+
+        Returns (logs, checkpoint). Attacks are read once, in insertion order, so updates to an
+        ongoing attack after it was read are not returned again.
+        """
+        checkpoint = dict(checkpoint or {})
+        logs = []
+        for protocol in self.LOG_SOURCES:
+            db_path = self.db_dir / f"{protocol}.sqlite3"
+            if len(logs) >= limit or not db_path.exists():
+                continue
+            query = self._select_logs(protocol) + " WHERE a.rowid > ? ORDER BY a.rowid LIMIT ?"
+            with self._connection(protocol, db_path) as conn:
+                rows = conn.execute(query, (checkpoint.get(protocol, 0), limit - len(logs))).fetchall()
+            if not rows:
+                continue
+            src_ips = self._ips_to_str([row["src_ip"] for row in rows])
+            logs.extend(self._to_log(row, src_ip) for row, src_ip in zip(rows, src_ips))
+            checkpoint[protocol] = rows[-1]["row_id"]
+        return logs, checkpoint
+
+    def _to_log(self, row, src_ip):
+        """Converts a normalised and scored attack row into a log entry"""
+        source = self.LOG_SOURCES[row["source"]]
+        log = {
+            "honeypot": "ddospot",
+            "protocol": source["name"],
+            "src_ip": src_ip,
+            "src_port": row["src_port"]
+        }
+        for field in source["fields"]:
+            log[field] = row[field]
+        if "mode" in log:
+            log["mode"] = f"{row['mode']} ({self.NTP_MODES.get(row['mode'], 'unknown')})"
+        log.update({
+            "attack_start": row["start"],
+            "attack_end": row["latest"],
+            "packet_count": row["count"],
+            "amplification_factor": row["amplification"],
+            "severity": row["severity"]
+        })
+        return log
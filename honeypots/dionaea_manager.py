@@ -7,16 +7,72 @@ from pathlib import Path
 import shutil
 import hashlib
 import datetime
+import sqlite3
+import threading
+import time
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import closing
 from itertools import islice
 
+from honeypots.dionaea_parsers import parse_bistream
+from honeypots import fuzzy_hash
+
 
 class DionaeaManager:
     """Dionaea honeypot manager using Docker"""
 
+    CPU_BOUND_TYPES = {"mysqld"} # Parsed in worker processes by the pooled mode
+    # log_sqlite connection_protocol -> entry type, as set by the bistream parsers
+    SQLITE_TYPES = {"httpd": "http", "ftpd": "ftp", "mysqld": "mysql"}
+    # log_sqlite has no request line, user agent or endpoint for HTTP, nor the clear text password
+    # the MySQL parser recovers from the handshake, so "auto" keeps parsing bistreams for them
+    BISTREAM_ONLY_TYPES = {"httpd", "mysqld"}
+    HASH_CHUNK_SIZE = 1024 * 1024
+    FUZZY_MAX_SIZE = 16 * 1024 * 1024 # Larger samples are stored but not similarity hashed
+    # Leading bytes -> file type of captured binaries
+    MAGIC_TYPES = (
+        (b"MZ", "pe"),
+        (b"\x7fELF", "elf"),
+        (b"\xfe\xed\xfa\xce", "macho"),
+        (b"\xfe\xed\xfa\xcf", "macho"),
+        (b"\xce\xfa\xed\xfe", "macho"),
+        (b"\xcf\xfa\xed\xfe", "macho"),
+        (b"\xca\xfe\xba\xbe", "java-class"),
+        (b"PK\x03\x04", "zip"),
+        (b"Rar!", "rar"),
+        (b"7z\xbc\xaf\x27\x1c", "7z"),
+        (b"\x1f\x8b", "gzip"),
+        (b"BZh", "bzip2"),
+        (b"%PDF", "pdf"),
+        (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "ole"),
+        (b"#!", "script"),
+    )
+
     def __init__(self):
         self.container_name = "honeydash-dionaea"
         self.image_name = "dinotools/dionaea:latest"
         self.data_dir = Path("/opt/honeydash/dionaea-data")
+        self.catalog_db = self.data_dir / "honeydash-catalog.sqlite3" # HoneyDash's index of Dionaea files
+        self.dionaea_db = self.data_dir / "sqlite" / "dionaea.sqlite" # Written by Dionaea's log_sqlite
+        self._catalog_lock = threading.Lock()
+        self._binaries_lock = threading.Lock() # Held by the background binaries refresh only
+        self.binaries_commit_size = 32 # Hashed binaries written per catalog transaction
+        self.parse_cache_size = 4096 # Parsed bistreams kept in memory
+        self.persist_parsed = True # Also keep parsed bistreams in the catalog
+        self._parse_cache = OrderedDict()
+        self._parse_cache_lock = threading.Lock()
+        self.parse_workers = min(8, os.cpu_count() or 1)
+        self.pooled_parsing = False # Parse uncached files concurrently, slower than sequential so far
+        self.parse_batch_size = 64 # Files handed to the pools at once
+        self._thread_pool = None
+        self._process_pool = None
+        self._parse_pool_lock = threading.Lock()
+        self.store_dir = self.data_dir / "honeydash-store" # Captured binaries by sha256
+        self.fuzzy_refresh_interval = 60
+        self.ship_settle_time = 60 # Seconds since the last write before a bistream is shipped
+        self._fuzzy_stop = threading.Event()
         docker_installed = self._detect_docker_installation()
         dionaea_container = self._detect_container()
         if not docker_installed:
@@ -25,6 +81,7 @@ class DionaeaManager:
             print(f"[-] Dionaea container '{self.container_name}' not found")
         else:
             print(f"[+] Dionaea container '{self.container_name}' found")
+        threading.Thread(target=self._fuzzy_loop, daemon=True).start()
         
 
     def _detect_docker_installation(self):
@@ -264,8 +321,229 @@ class DionaeaManager:
                 "message": f"Error stopping Dionaea: {str(e)}"
             }
     
-    def get_logs(self, limit, itype, timestamp):
-        """Get Dionaea logs"""
+    def _open_catalog(self):
+        """Opens HoneyDash's catalog of Dionaea files, creating its tables if needed"""
+        conn = sqlite3.connect(str(self.catalog_db), timeout=30)
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS bistreams (
+                path TEXT PRIMARY KEY,
+                dir TEXT NOT NULL,
+                type TEXT NOT NULL,
+                src_ip TEXT,
+                timestamp TEXT,
+                size INTEGER NOT NULL,
+                mtime INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS bistreams_type_recent ON bistreams(type, timestamp, path);
+            CREATE INDEX IF NOT EXISTS bistreams_dir ON bistreams(dir);
+            CREATE TABLE IF NOT EXISTS bistream_dirs (
+                path TEXT PRIMARY KEY,
+                mtime INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS binary_dirs (
+                path TEXT PRIMARY KEY,
+                mtime INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS binaries (
+                path TEXT PRIMARY KEY,
+                md5 TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                ctime REAL NOT NULL,
+                mtime INTEGER NOT NULL,
+                magic TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS binaries_ctime ON binaries(ctime, path);
+            CREATE INDEX IF NOT EXISTS binaries_size ON binaries(size, path);
+            CREATE INDEX IF NOT EXISTS binaries_magic_ctime ON binaries(magic, ctime, path);
+            CREATE INDEX IF NOT EXISTS binaries_magic_size ON binaries(magic, size, path);
+            CREATE INDEX IF NOT EXISTS binaries_md5 ON binaries(md5);
+            CREATE INDEX IF NOT EXISTS binaries_sha256 ON binaries(sha256);
+            CREATE TABLE IF NOT EXISTS samples (
+                sha256 TEXT PRIMARY KEY,
+                md5 TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                magic TEXT NOT NULL,
+                first_seen REAL NOT NULL,
+                fuzzy TEXT
+            );
+            CREATE INDEX IF NOT EXISTS samples_md5 ON samples(md5);
+            CREATE TABLE IF NOT EXISTS sample_ngrams (
+                block_size INTEGER NOT NULL,
+                gram TEXT NOT NULL,
+                sha256 TEXT NOT NULL,
+                PRIMARY KEY (block_size, gram, sha256)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS parsed_bistreams (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime INTEGER NOT NULL,
+                entry TEXT NOT NULL
+            );
+        """)
+        return conn
+
+    def _parse_bistream_name(self, name):
+        """Extracts (type, src_ip, timestamp) from a bistream file name"""
+        parts = name.split("-")
+        log_type = parts[0]
+        src_ip = parts[3] if len(parts) > 3 else None
+        timestamp = None
+        if len(parts) > 7:
+            timestamp = parts[5] + "-" + parts[6] + "-" + parts[7][:-7]
+        return log_type, src_ip, timestamp
+
+    def refresh_catalog(self):
+        """Brings the bistream catalog up to date
+
+        Only dated directories whose mtime changed (files added or removed) are listed again,
+        plus the newest one, where Dionaea may still be appending to open streams.
+        """
+        log_dir = self.data_dir / "bistreams"
+        with self._catalog_lock, closing(self._open_catalog()) as catalog:
+            known = dict(catalog.execute("SELECT path, mtime FROM bistream_dirs"))
+            current = {}
+            with os.scandir(log_dir) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        current[entry.path] = entry.stat().st_mtime_ns
+            newest = max(current) if current else None # YYYY-MM-DD directories
+
+            with catalog:
+                for gone in set(known) - set(current):
+                    catalog.execute("DELETE FROM parsed_bistreams WHERE path IN (SELECT path FROM bistreams WHERE dir = ?)", (gone,))
+                    catalog.execute("DELETE FROM bistreams WHERE dir = ?", (gone,))
+                    catalog.execute("DELETE FROM bistream_dirs WHERE path = ?", (gone,))
+
+                for dir_path, mtime in current.items():
+                    if known.get(dir_path) == mtime and dir_path != newest:
+                        continue
+                    self._scan_bistream_dir(catalog, dir_path)
+                    catalog.execute(
+                        "INSERT OR REPLACE INTO bistream_dirs (path, mtime) VALUES (?, ?)",
+                        (dir_path, mtime)
+                    )
+
+    def _scan_bistream_dir(self, catalog, dir_path):
+        """Syncs the catalog rows of one bistream directory with its files"""
+        cataloged = {
+            path: (size, mtime)
+            for path, size, mtime in catalog.execute("SELECT path, size, mtime FROM bistreams WHERE dir = ?", (dir_path,))
+        }
+        seen = set()
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                seen.add(entry.path)
+                stat = entry.stat()
+                if cataloged.get(entry.path) == (stat.st_size, stat.st_mtime_ns):
+                    continue
+                log_type, src_ip, timestamp = self._parse_bistream_name(entry.name)
+                catalog.execute(
+                    "INSERT OR REPLACE INTO bistreams (path, dir, type, src_ip, timestamp, size, mtime) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (entry.path, dir_path, log_type, src_ip, timestamp, stat.st_size, stat.st_mtime_ns)
+                )
+        removed = [(path,) for path in set(cataloged) - seen]
+        catalog.executemany("DELETE FROM bistreams WHERE path = ?", removed)
+        catalog.executemany("DELETE FROM parsed_bistreams WHERE path = ?", removed)
+
+    def _parse_bistreams(self, catalog, batch, pending):
+        """Returns the parsed entries of a batch of catalog rows, in the same order
+
+        Entries are cached by (path, size, mtime) in memory and, if `persist_parsed` is set, in
+        the catalog. New entries to persist are appended to `pending`. Files missing from both
+        caches are parsed concurrently when `pooled_parsing` is set.
+        """
+        entries = [None] * len(batch)
+        missing = []
+        for i, (path, log_type, _, size, mtime) in enumerate(batch):
+            key = (path, size, mtime)
+            with self._parse_cache_lock:
+                if key in self._parse_cache:
+                    self._parse_cache.move_to_end(key)
+                    entries[i] = self._parse_cache[key]
+                    continue
+            row = None
+            if self.persist_parsed:
+                row = catalog.execute(
+                    "SELECT entry FROM parsed_bistreams WHERE path = ? AND size = ? AND mtime = ?", key
+                ).fetchone()
+            if row:
+                entries[i] = json.loads(row[0])
+                self._cache_entry(key, entries[i])
+            else:
+                missing.append(i)
+
+        # Small batches (e.g. a refresh with a few new files) are not worth the hand-off
+        if self.pooled_parsing and len(missing) >= self.parse_workers * 2:
+            pool = self._parse_pool(batch[0][1]) # A batch only holds one type
+            chunksize = max(1, len(missing) // (self.parse_workers * 4))
+            results = pool.map(
+                DionaeaManager._to_json,
+                [batch[i][0] for i in missing],
+                [batch[i][1] for i in missing],
+                chunksize=chunksize
+            )
+            parsed = dict(zip(missing, results))
+        else:
+            parsed = {i: self._to_json(batch[i][0], batch[i][1]) for i in missing}
+
+        for i, log_entry in parsed.items():
+            path, _, _, size, mtime = batch[i]
+            entries[i] = log_entry
+            self._cache_entry((path, size, mtime), log_entry)
+            if self.persist_parsed:
+                pending.append((path, size, mtime, json.dumps(log_entry)))
+        return entries
+
+    def _cache_entry(self, key, log_entry):
+        """Adds a parsed entry to the in-memory LRU"""
+        with self._parse_cache_lock:
+            self._parse_cache[key] = log_entry
+            if len(self._parse_cache) > self.parse_cache_size:
+                self._parse_cache.popitem(last=False)
+
+    def _parse_pool(self, log_type):
+        """Returns the executor parsing `log_type` files
+
+        MySQL streams go to processes since their password heuristics are CPU bound, the other
+        types are dominated by file opens and use threads. Processes are started from a fork
+        server (or spawned), forking the threaded server process could copy held locks.
+        """
+        with self._parse_pool_lock:
+            if log_type in self.CPU_BOUND_TYPES:
+                if self._process_pool is None:
+                    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                    self._process_pool = ProcessPoolExecutor(
+                        max_workers=self.parse_workers, mp_context=multiprocessing.get_context(method)
+                    )
+                return self._process_pool
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(max_workers=self.parse_workers, thread_name_prefix="dionaea-parse")
+            return self._thread_pool
+
+    def close(self):
+        """Shuts down the parse pools and the similarity hashing thread"""
+        self._fuzzy_stop.set()
+        with self._parse_pool_lock:
+            for pool in (self._thread_pool, self._process_pool):
+                if pool is not None:
+                    pool.shutdown(cancel_futures=True)
+            self._thread_pool = self._process_pool = None
+
+    def get_logs(self, limit, itype, timestamp, cursor=None, src_ip=None, backend="auto"):
+        """Get Dionaea logs, newest first
+
+        Args:
+            limit: Maximum number of entries returned
+            itype: Service (httpd, ftpd, mysqld)
+            timestamp: Only entries from this timestamp onwards
+            cursor: `cursor_next` value returned by the previous page
+            src_ip: Only entries from this source IP
+            backend: "sqlite" (Dionaea's log_sqlite database), "bistreams" (raw stream files) or
+                "auto" (the database when it exists, bistreams otherwise and for HTTP and MySQL)
+        """
         try:
             if not self._detect_docker_installation():
                 return {
@@ -277,49 +555,33 @@ class DionaeaManager:
                     "success": False,
                     "message": "Dionaea is not installed"
                 }
-            
-            log_dir = self.data_dir / "bistreams"
-            if not log_dir.exists():
+            if backend not in ("auto", "sqlite", "bistreams"):
                 return {
                     "success": False,
-                    "message": "Log directory not found"
+                    "message": f"Unknown backend: {backend}"
                 }
-            
-            logs = []
-            counter = 0
-            if not timestamp:
-                for dir in log_dir.iterdir():
-                    if dir.is_dir():
-                        for log_file in dir.iterdir():
-                            log_type = log_file.name.split("-")[0]
-                            if log_type == itype:
-                                log_entry = self._to_json(log_file, log_type)
-                                if log_entry:
-                                    logs.append(log_entry)
-                                    counter += 1
-                                    if counter >= limit:
-                                        break
-                        if counter >= limit:
-                            break
+
+            if backend == "auto":
+                use_db = itype not in self.BISTREAM_ONLY_TYPES and self.dionaea_db.exists()
+                backend = "sqlite" if use_db else "bistreams"
+
+            if backend == "sqlite":
+                if not self.dionaea_db.exists():
+                    return {
+                        "success": False,
+                        "message": "Dionaea database not found"
+                    }
+                result = self._get_sqlite_logs(limit, itype, timestamp, cursor, src_ip)
             else:
-                for dir in log_dir.iterdir():
-                    if dir.is_dir():
-                        for log_file in dir.iterdir():
-                            log_type = log_file.name.split("-")[0]
-                            log_timestamp = log_file.name.split("-")[5] + "-" + log_file.name.split("-")[6] + "-" + log_file.name.split("-")[7][:-7]
-                            if log_type == itype and log_timestamp >= timestamp:
-                                log_entry = self._to_json(log_file, log_type)
-                                if log_entry:
-                                    logs.append(log_entry)
-                                    counter += 1
-                                    if counter >= limit:
-                                        break
-                        if counter >= limit:
-                            break
-            return {
-                "success": True,
-                "logs": logs
-            }
+                log_dir = self.data_dir / "bistreams"
+                if not log_dir.exists():
+                    return {
+                        "success": False,
+                        "message": "Log directory not found"
+                    }
+                result = self._get_bistream_logs(limit, itype, timestamp, cursor, src_ip)
+            result["backend"] = backend
+            return result
         
         except Exception as e:
             return {
@@ -327,117 +589,360 @@ class DionaeaManager:
                 "message": f"Error reading log file: {str(e)}"
             }
 
-    def _to_json(self, log_file, log_type):
-        """Converts a Dionaea log file to JSON format"""
-        if log_type == "httpd":
-            with open(log_file, 'r') as f:
-                # fist line = request
-                request = f.readline().strip()
-                user_agent = re.search(r'User-Agent: ([^\\]+)', request)
-                ip = log_file.name.split("-")[3]
-                request_type = re.search(r'(GET|POST|HEAD|PUT|DELETE|OPTIONS|TRACE|CONNECT)\s', request)
-                endpoint = re.search(r'(GET|POST|HEAD|PUT|DELETE|OPTIONS|TRACE|CONNECT)\s+(\S+)\s+HTTP', request)
-                date = log_file.name.split("-")[5] + "-" + log_file.name.split("-")[6] + "-" + log_file.name.split("-")[7][:-7]
-                username = re.search(r'username=([^\&]+)', request)
-                password = re.search(r'password=([^\']+)', request)
-                filename = re.search(r'filename="([^"]+)"', request)
-                
-                log_entry = {"timestamp": date}
-                log_entry["honeypot"] = 'dionaea'
-                log_entry["type"] = 'http'
-                
-                if ip:
-                    log_entry["src_ip"] = ip
-                if user_agent:
-                    log_entry["user_agent"] = user_agent.group(1)
-                if request_type:
-                    log_entry["request_type"] = request_type.group(1)
-                if endpoint:
-                    log_entry["endpoint"] = endpoint.group(2)
-                if username:
-                    log_entry["username"] = username.group(1)
-                if password:
-                    log_entry["password"] = password.group(1)
-                if filename:
-                    log_entry["filename"] = filename.group(1)
-                
-                return log_entry
-        elif log_type == "ftpd":
-            with open(log_file, 'r') as f:
-                content = f.read()
-                
-                ip = log_file.name.split("-")[3]
-                date = log_file.name.split("-")[5] + "-" + log_file.name.split("-")[6] + "-" + log_file.name.split("-")[7][:-7]
-                username = re.search(r'USER ([^\\]+)', content)
-                password = re.search(r'PASS ([^\\]+)', content)
-                filename = re.search(r'STOR ([^\\]+)', content)
-                
-                log_entry = {"timestamp": date}
-                log_entry["honeypot"] = 'dionaea'
-                log_entry["type"] = 'ftp'
-                log_entry["src_ip"] = ip
-
-                if username:
-                    log_entry["username"] = username.group(1)
-                if password:
-                    log_entry["password"] = password.group(1)
+    def _get_bistream_logs(self, limit, itype, timestamp, cursor, src_ip):
+        """Get Dionaea logs by parsing the bistream files listed in the catalog"""
+        self.refresh_catalog()
+
+        query = "SELECT path, type, timestamp, size, mtime FROM bistreams WHERE type = ? AND timestamp IS NOT NULL"
+        params = [itype]
+        if timestamp:
+            query += " AND timestamp >= ?"
+            params.append(timestamp)
+        if src_ip:
+            query += " AND src_ip = ?"
+            params.append(src_ip)
+        if cursor:
+            # cursor = "<timestamp>|<path>" of the last file read by the previous page
+            cursor_timestamp, cursor_path = cursor.split("|", 1)
+            query += " AND timestamp <= ? AND (timestamp < ? OR path < ?)"
+            params.extend([cursor_timestamp, cursor_timestamp, cursor_path])
+        query += " ORDER BY timestamp DESC, path DESC"
+
+        # Files are read newest first and only until `limit` entries are parsed
+        logs = []
+        cursor_next = None
+        has_next = False
+        pending = []
+        with closing(self._open_catalog()) as catalog:
+            rows = catalog.execute(query, params)
+            while len(logs) < limit:
+                # Most files yield an entry, so only fetch as many as are still needed
+                batch = rows.fetchmany(min(limit - len(logs), self.parse_batch_size))
+                if not batch:
+                    break
+                entries = self._parse_bistreams(catalog, batch, pending)
+                for i, log_entry in enumerate(entries):
+                    cursor_next = f"{batch[i][2]}|{batch[i][0]}"
+                    if log_entry:
+                        logs.append(dict(log_entry))
+                        if len(logs) >= limit:
+                            has_next = i + 1 < len(batch) or rows.fetchone() is not None
+                            break
+            if pending:
+                with catalog:
+                    catalog.executemany(
+                        "INSERT OR REPLACE INTO parsed_bistreams (path, size, mtime, entry) VALUES (?, ?, ?, ?)",
+                        pending
+                    )
+        return {
+            "success": True,
+            "logs": logs,
+            "has_next": has_next,
+            "cursor_next": cursor_next if has_next else None
+        }
+
+    def get_new_logs(self, checkpoint, limit):
+        """Bistream entries added to the catalog since `checkpoint`, used to ship them to a SIEM
+
+        Args:
+            checkpoint: Catalog rowid of the last file read by the previous call, None at first
+            limit: Max number of files read
+
+        Returns (logs, checkpoint). Files modified in the last `ship_settle_time` seconds may still
+        be written by Dionaea, reading stops at the first one until it settles.
+        """
+        if not (self.data_dir / "bistreams").exists():
+            return [], checkpoint
+        self.refresh_catalog()
+
+        settled = (time.time() - self.ship_settle_time) * 1e9
+        logs = []
+        pending = []
+        with closing(self._open_catalog()) as catalog:
+            rows = catalog.execute(
+                "SELECT rowid, path, type, timestamp, size, mtime FROM bistreams WHERE rowid > ? AND timestamp IS NOT NULL ORDER BY rowid LIMIT ?",
+                (checkpoint or 0, limit)
+            ).fetchall()
+            for i, row in enumerate(rows):
+                if row[5] > settled:
+                    rows = rows[:i]
+                    break
+
+            # Pools are picked by type, so files are parsed in one batch per type
+            by_type = {}
+            for row in rows:
+                by_type.setdefault(row[2], []).append(row)
+            entries = {}
+            for batch in by_type.values():
+                parsed = self._parse_bistreams(catalog, [row[1:] for row in batch], pending)
+                entries.update(zip((row[0] for row in batch), parsed))
+            logs = [dict(entries[row[0]]) for row in rows if entries[row[0]]]
+
+            if pending:
+                with catalog:
+                    catalog.executemany(
+                        "INSERT OR REPLACE INTO parsed_bistreams (path, size, mtime, entry) VALUES (?, ?, ?, ?)",
+                        pending
+                    )
+        if rows:
+            checkpoint = rows[-1][0]
+        return logs, checkpoint
+
+    def _open_dionaea_db(self):
+        """Opens a read-only connection to Dionaea's log_sqlite database"""
+        conn = sqlite3.connect(f"file:{self.dionaea_db}?mode=ro", uri=True, isolation_level=None)
+        conn.execute("PRAGMA query_only = ON")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _get_sqlite_logs(self, limit, itype, timestamp, cursor, src_ip):
+        """Get Dionaea logs from the connections, logins and downloads tables of log_sqlite
+
+        Pages are read through Dionaea's own connection_timestamp and remote_host indexes, then
+        the logins and downloads of the page are fetched with one query each.
+        """
+        # "+" keeps SQLite from picking the low-selectivity connection_type index over the
+        # timestamp one, which also gives the page order without sorting
+        query = """
+            SELECT connection, connection_timestamp, remote_host, remote_port, local_port
+            FROM connections
+            WHERE connection_protocol = ? AND +connection_type = 'accept'
+        """
+        params = [itype]
+        if timestamp:
+            query += " AND connection_timestamp >= ?"
+            params.append(self._to_epoch(timestamp))
+        if src_ip:
+            query += " AND remote_host = ?"
+            params.append(src_ip)
+        if cursor:
+            # cursor = "<connection_timestamp>|<connection>" of the last row of the previous page
+            cursor_timestamp, cursor_connection = cursor.split("|", 1)
+            cursor_timestamp = float(cursor_timestamp)
+            query += " AND connection_timestamp <= ? AND (connection_timestamp < ? OR connection < ?)"
+            params.extend([cursor_timestamp, cursor_timestamp, int(cursor_connection)])
+        query += " ORDER BY connection_timestamp DESC, connection DESC LIMIT ?"
+        params.append(limit + 1)
+
+        with closing(self._open_dionaea_db()) as conn:
+            rows = conn.execute(query, params).fetchall()
+            has_next = len(rows) > limit
+            rows = rows[:limit]
+
+            ids = [row["connection"] for row in rows]
+            placeholders = ",".join("?" * len(ids))
+            logins = {}
+            downloads = {}
+            if ids:
+                for login in conn.execute(
+                    f"SELECT connection, login_username, login_password FROM logins WHERE connection IN ({placeholders}) ORDER BY login",
+                    ids
+                ):
+                    logins.setdefault(login["connection"], login)
+                for download in conn.execute(
+                    f"SELECT connection, download_url, download_md5_hash FROM downloads WHERE connection IN ({placeholders}) ORDER BY download",
+                    ids
+                ):
+                    downloads.setdefault(download["connection"], download)
+
+        log_type = self.SQLITE_TYPES.get(itype, itype)
+        logs = []
+        for row in rows:
+            date = datetime.datetime.fromtimestamp(row["connection_timestamp"], datetime.timezone.utc)
+            log_entry = {"timestamp": date.strftime("%Y-%m-%dT%H:%M:%S")}
+            log_entry["honeypot"] = 'dionaea'
+            log_entry["type"] = log_type
+            log_entry["src_ip"] = row["remote_host"]
+            log_entry["src_port"] = row["remote_port"]
+            log_entry["dst_port"] = row["local_port"]
+
+            login = logins.get(row["connection"])
+            if login:
+                log_entry["username"] = login["login_username"]
+                log_entry["password"] = login["login_password"]
+            download = downloads.get(row["connection"])
+            if download:
+                log_entry["download_url"] = download["download_url"]
+                log_entry["md5"] = download["download_md5_hash"]
+                # Same field as the bistream parsers (first uploaded file), the dashboard filters on it
+                filename = (download["download_url"] or "").rstrip("/").rsplit("/", 1)[-1]
                 if filename:
-                    log_entry["filename"] = filename.group(1)
-                    
-                return log_entry
-    
-        elif log_type == "mysqld":
-            with open(log_file, 'r') as f:
-                content = f.read()
-                ip = log_file.name.split("-")[3]
-                date = log_file.name.split("-")[5] + "-" + log_file.name.split("-")[6] + "-" + log_file.name.split("-")[7][:-7]
-                username = re.search(r'\\x00\\x00\\x00([a-zA-Z0-9_-]+)\\x00', content)
-
-                log_entry = {"timestamp": date}
-                log_entry["honeypot"] = 'dionaea'
-                log_entry["type"] = 'mysql'
-                log_entry["src_ip"] = ip
-
-                if username:
-                    username = username.group(1)
-                    log_entry["username"] = username
-
-                    line_pattern = rf'\\x00\\x00\\x00{re.escape(username)}\\x00[^\n\r]*?(?=\n|\r|$)'
-                    line = re.search(line_pattern, content)
-                    if line:
-                        line_content = line.group(0)
-                        # username\x00\x00') = no password was sent
-                        hashed_pattern = rf"{re.escape(username)}\\x00\\x00'\)"
-                        if re.search(hashed_pattern, line_content):
-                            log_entry["password"] = "Password not sent"
-                        else:
-                            # username\xXX<password>\x00')
-                            hash_marker_pattern = rf"{re.escape(username)}\\x[a-fA-F0-9]{{2}}(.+?)\\x00'\)"
-                            hash_match = re.search(hash_marker_pattern, line_content)
-                            
-                            if hash_match:
-                                hash = hash_match.group(1)
-
-                                candidates = re.findall(r'(?:^|[^\\x])([a-zA-Z][a-zA-Z0-9_@!#$%^&*()+\-]{3,})', hash)
-                                
-                                valid = []
-                                for candidate in candidates:
-                                    if candidate[0] == 'x' and len(candidate) > 2 and re.match(r'^x[0-9a-fA-F]{2}', candidate):
-                                            continue
-                                    valid.append(candidate)
-                                
-                                if valid:
-                                    log_entry["password"] = valid[-1] 
-                                else:
-                                    log_entry["password"] = "Password is hashed"
-                            else:
-                                log_entry["password"] = "Password is hashed"
-
-                return log_entry
-        return None
+                    log_entry["filename"] = filename
+            logs.append(log_entry)
+
+        cursor_next = None
+        if has_next:
+            cursor_next = f"{rows[-1]['connection_timestamp']}|{rows[-1]['connection']}"
+        return {
+            "success": True,
+            "logs": logs,
+            "has_next": has_next,
+            "cursor_next": cursor_next
+        }
+
+    def _to_epoch(self, timestamp):
+        """Converts an ISO timestamp (UTC, as in log entries) to Dionaea's epoch seconds"""
+        date = datetime.datetime.fromisoformat(timestamp.replace(" ", "T"))
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=datetime.timezone.utc)
+        return date.timestamp()
+
+    @staticmethod
+    def _to_json(log_file, log_type):
+        """Converts a Dionaea log file to JSON format"""
+        return parse_bistream(log_file, log_type)
     
-    def get_binaries(self, page):
-        """Get binaries captured by Dionaea"""
+    def refresh_binaries(self):
+        """Brings the binaries catalog up to date, from the background thread
+
+        The directory is only listed again when its mtime changes (Dionaea moves finished
+        downloads into it), and only new or modified files are hashed. Files are hashed outside
+        any transaction and written `binaries_commit_size` at a time, so requests keep reading
+        the catalog (and see new binaries as they are hashed) during a large backfill.
+        """
+        binaries_dir = self.data_dir / "binaries"
+        with self._binaries_lock, closing(self._open_catalog()) as catalog:
+            dir_mtime = binaries_dir.stat().st_mtime_ns
+            known = catalog.execute("SELECT mtime FROM binary_dirs WHERE path = ?", (str(binaries_dir),)).fetchone()
+            if known and known[0] == dir_mtime:
+                return
+
+            cataloged = {
+                path: (size, mtime)
+                for path, size, mtime in catalog.execute("SELECT path, size, mtime FROM binaries")
+            }
+            seen = set()
+            hashed = []
+            with os.scandir(binaries_dir) as entries:
+                for entry in entries:
+                    if self._fuzzy_stop.is_set():
+                        return # The directory watermark is not saved, the next run resumes
+                    if not entry.is_file():
+                        continue
+                    seen.add(entry.path)
+                    stat = entry.stat()
+                    if cataloged.get(entry.path) == (stat.st_size, stat.st_mtime_ns):
+                        continue
+                    md5, sha256, magic = self._hash_binary(entry.path)
+                    self._store_sample(entry.path, sha256)
+                    hashed.append((entry.path, md5, sha256, magic, stat))
+                    if len(hashed) >= self.binaries_commit_size:
+                        self._write_binaries(catalog, hashed)
+                        hashed = []
+
+            self._write_binaries(catalog, hashed)
+            with catalog:
+                catalog.executemany(
+                    "DELETE FROM binaries WHERE path = ?",
+                    ((path,) for path in set(cataloged) - seen)
+                )
+                catalog.execute(
+                    "INSERT OR REPLACE INTO binary_dirs (path, mtime) VALUES (?, ?)",
+                    (str(binaries_dir), dir_mtime)
+                )
+
+    def _write_binaries(self, catalog, hashed):
+        """Catalogs a chunk of hashed binaries [(path, md5, sha256, magic, stat)] in one transaction"""
+        with catalog:
+            catalog.executemany(
+                "INSERT OR REPLACE INTO binaries (path, md5, sha256, size, ctime, mtime, magic) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(path, md5, sha256, stat.st_size, stat.st_ctime, stat.st_mtime_ns, magic)
+                 for path, md5, sha256, magic, stat in hashed]
+            )
+            catalog.executemany(
+                "INSERT OR IGNORE INTO samples (sha256, md5, size, magic, first_seen) VALUES (?, ?, ?, ?, ?)",
+                [(sha256, md5, stat.st_size, magic, stat.st_ctime) for path, md5, sha256, magic, stat in hashed]
+            )
+
+    def _store_sample(self, path, sha256):
+        """Keeps one copy of a binary per sha256 in the store, hard linked when possible"""
+        stored = self.store_dir / sha256[:2] / sha256
+        if stored.exists():
+            return
+        stored.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(path, stored)
+        except OSError:
+            shutil.copy2(path, stored)
+
+    def refresh_fuzzy_hashes(self):
+        """Similarity hashes stored samples that do not have one yet, newest first"""
+        with closing(self._open_catalog()) as catalog:
+            pending = catalog.execute(
+                "SELECT sha256, size FROM samples WHERE fuzzy IS NULL ORDER BY first_seen DESC"
+            ).fetchall()
+            for sha256, size in pending:
+                if self._fuzzy_stop.is_set():
+                    break
+                self._index_sample(catalog, sha256, size)
+
+    def _index_sample(self, catalog, sha256, size):
+        """Computes the similarity hash of a stored sample and indexes its n-grams
+
+        The hash is left empty for samples over FUZZY_MAX_SIZE or missing from the store.
+        """
+        stored = self.store_dir / sha256[:2] / sha256
+        fuzzy = ""
+        if size <= self.FUZZY_MAX_SIZE and stored.exists():
+            fuzzy = fuzzy_hash.fuzzy_hash(stored.read_bytes())
+        with catalog:
+            catalog.execute("UPDATE samples SET fuzzy = ? WHERE sha256 = ?", (fuzzy, sha256))
+            if fuzzy:
+                catalog.executemany(
+                    "INSERT OR IGNORE INTO sample_ngrams (block_size, gram, sha256) VALUES (?, ?, ?)",
+                    [(block_size, gram, sha256) for block_size, gram in fuzzy_hash.ngrams(fuzzy)]
+                )
+        return fuzzy
+
+    def _fuzzy_loop(self):
+        """Catalogs new binaries and similarity hashes them at startup, then every `fuzzy_refresh_interval` seconds
+
+        This is the only caller of refresh_binaries, requests serve what is already cataloged.
+        """
+        while True:
+            try:
+                if (self.data_dir / "binaries").exists():
+                    self.refresh_binaries()
+                    self.refresh_fuzzy_hashes()
+            except Exception as e:
+                print(f"[-] Error hashing Dionaea binaries: {str(e)}")
+            if self._fuzzy_stop.wait(self.fuzzy_refresh_interval):
+                break
+
+    def _hash_binary(self, path):
+        """Returns (md5, sha256, magic type) of a file, reading it in chunks"""
+        md5 = hashlib.md5()
+        sha256 = hashlib.sha256()
+        magic = None
+        with open(path, 'rb') as f:
+            while chunk := f.read(self.HASH_CHUNK_SIZE):
+                if magic is None:
+                    magic = self._magic_type(chunk)
+                md5.update(chunk)
+                sha256.update(chunk)
+        return md5.hexdigest(), sha256.hexdigest(), magic or "empty"
+
+    def _magic_type(self, header):
+        """Identifies a file type from its first bytes"""
+        for signature, file_type in self.MAGIC_TYPES:
+            if header.startswith(signature):
+                return file_type
+        return "data"
+
+    def get_binaries(self, page=1, page_size=9, sort="ctime", order="desc", hash_prefix=None,
+                     min_size=None, max_size=None, file_type=None, cursor=None):
+        """Get binaries captured by Dionaea
+
+        Args:
+            page: Page number, ignored when `cursor` is given
+            page_size: Binaries per page (1-100)
+            sort: "ctime" or "size"
+            order: "desc" or "asc"
+            hash_prefix: Only binaries whose md5 or sha256 starts with this hex string
+            min_size, max_size: Only binaries within this size range (bytes)
+            file_type: Only binaries of this magic type (pe, elf, zip...)
+            cursor: `cursor_next` value returned by the previous page (keyset pagination)
+        """
         try:
             if not self._detect_docker_installation():
                 return {
@@ -449,55 +954,215 @@ class DionaeaManager:
                     "success": False,
                     "message": "Dionaea is not installed"
                 }
-            
-            binaries_dir = self.data_dir / "binaries"
-            if not binaries_dir.exists():
+            if sort not in ("ctime", "size") or order not in ("desc", "asc"):
                 return {
                     "success": False,
-                    "message": "Binaries directory not found"
+                    "message": "Binaries can only be sorted by ctime or size, in desc or asc order"
                 }
-            files = []
-            for f in binaries_dir.iterdir():
-                if f.is_file():
-                    files.append(f)
-            
-            total = len(files)
-            
-            if total == 0:
+            if hash_prefix and not re.fullmatch(r'[0-9a-fA-F]{1,64}', hash_prefix):
                 return {
                     "success": False,
-                    "message": "No binaries found"
+                    "message": "Hash prefix must be hexadecimal"
+                }
+            if page < 1:
+                return {
+                    "success": False,
+                    "message": "Page must be 1 or more"
+                }
+            if not 1 <= page_size <= 100:
+                return {
+                    "success": False,
+                    "message": "Page size must be between 1 and 100"
                 }
-
-            start_idx = (page - 1) * 9
-            end_idx = start_idx + 9
             
-            if start_idx >= total:
+            binaries_dir = self.data_dir / "binaries"
+            if not binaries_dir.exists():
                 return {
                     "success": False,
-                    "message": "No more binaries available",
-                    "total": total,
-                    "page": page
+                    "message": "Binaries directory not found"
                 }
 
+            conditions = []
+            params = []
+            if hash_prefix:
+                # Ranges instead of LIKE so both hash indexes are used ('g' sorts after every hex digit)
+                prefix = hash_prefix.lower()
+                conditions.append("((md5 >= ? AND md5 < ?) OR (sha256 >= ? AND sha256 < ?))")
+                params.extend([prefix, prefix + "g", prefix, prefix + "g"])
+            if min_size is not None:
+                conditions.append("size >= ?")
+                params.append(min_size)
+            if max_size is not None:
+                conditions.append("size <= ?")
+                params.append(max_size)
+            if file_type:
+                conditions.append("magic = ?")
+                params.append(file_type)
+
+            with closing(self._open_catalog()) as catalog:
+                where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+                total = catalog.execute(f"SELECT COUNT(*) FROM binaries{where}", params).fetchone()[0]
+                
+                if total == 0:
+                    return {
+                        "success": False,
+                        "message": "No binaries found"
+                    }
+
+                page_conditions = list(conditions)
+                page_params = list(params)
+                offset = 0
+                if cursor:
+                    # cursor = "<sort value>|<path>" of the last binary of the previous page
+                    cursor_value, cursor_path = cursor.split("|", 1)
+                    cursor_value = float(cursor_value) if sort == "ctime" else int(cursor_value)
+                    op = "<" if order == "desc" else ">"
+                    page_conditions.append(f"{sort} {op}= ? AND ({sort} {op} ? OR path {op} ?)")
+                    page_params.extend([cursor_value, cursor_value, cursor_path])
+                else:
+                    offset = (page - 1) * page_size
+                    if offset >= total:
+                        return {
+                            "success": False,
+                            "message": "No more binaries available",
+                            "total": total,
+                            "page": page
+                        }
+
+                where = f" WHERE {' AND '.join(page_conditions)}" if page_conditions else ""
+                rows = catalog.execute(
+                    f"SELECT path, md5, sha256, size, ctime, magic FROM binaries{where} "
+                    f"ORDER BY {sort} {order.upper()}, path {order.upper()} LIMIT ? OFFSET ?",
+                    page_params + [page_size + 1, offset]
+                ).fetchall()
+
+            has_next = len(rows) > page_size
+            rows = rows[:page_size]
             binaries = []
-            for binary in files[start_idx:end_idx]:
+            for path, md5, sha256, size, ctime, magic in rows:
                 binaries.append({
-                    "md5hash": hashlib.md5(open(binary, 'rb').read()).hexdigest(),
-                    "size": binary.stat().st_size,
-                    "timestamp": datetime.datetime.fromtimestamp(os.path.getctime(binary)).strftime("%Y-%m-%d %H:%M:%S")
+                    "md5hash": md5,
+                    "sha256": sha256,
+                    "size": size,
+                    "type": magic,
+                    "timestamp": datetime.datetime.fromtimestamp(ctime).strftime("%Y-%m-%d %H:%M:%S")
                 })
+
+            cursor_next = None
+            if has_next:
+                last_path, last_size, last_ctime = rows[-1][0], rows[-1][3], rows[-1][4]
+                cursor_next = f"{last_ctime if sort == 'ctime' else last_size}|{last_path}"
             
             return {
                 "success": True,
                 "binaries": binaries,
                 "total": total,
                 "page": page,
-                "total_pages": (total + 9 - 1) // 9
+                "page_size": page_size,
+                "total_pages": (total + page_size - 1) // page_size,
+                "has_next": has_next,
+                "cursor_next": cursor_next
             }
         
         except Exception as e:
             return {
                 "success": False,
                 "message": str(e)
-            }
\ No newline at end of file
+            }
+
+    def get_similar_binaries(self, sample_hash, threshold=50, limit=10):
+        """Get stored samples similar to the one with this md5 or sha256
+
+        Candidates are the samples sharing at least one signature n-gram (same or double block
+        size), looked up in the n-gram index, then scored 0-100 by edit distance.
+        """
+        try:
+            if not self._detect_docker_installation():
+                return {
+                    "success": False,
+                    "message": "Docker is not installed"
+                }
+            if not self._detect_container():
+                return {
+                    "success": False,
+                    "message": "Dionaea is not installed"
+                }
+            if not sample_hash or not re.fullmatch(r'[0-9a-fA-F]{32}|[0-9a-fA-F]{64}', sample_hash):
+                return {
+                    "success": False,
+                    "message": "Hash must be an md5 or sha256"
+                }
+
+            with closing(self._open_catalog()) as catalog:
+                sample_hash = sample_hash.lower()
+                sample = catalog.execute(
+                    "SELECT sha256, md5, size, magic, first_seen, fuzzy FROM samples WHERE sha256 = ? OR md5 = ?",
+                    (sample_hash, sample_hash)
+                ).fetchone()
+                if not sample:
+                    return {
+                        "success": False,
+                        "message": "Sample not found"
+                    }
+                sha256, md5, size, magic, first_seen, fuzzy = sample
+                if fuzzy is None:
+                    fuzzy = self._index_sample(catalog, sha256, size)
+                if not fuzzy:
+                    return {
+                        "success": False,
+                        "message": "Sample is too large or missing from the store"
+                    }
+
+                # Signatures only have two block sizes, one index range per block size
+                grams = {}
+                for block_size, gram in fuzzy_hash.ngrams(fuzzy):
+                    grams.setdefault(block_size, []).append(gram)
+                similar = []
+                if grams:
+                    conditions = []
+                    params = []
+                    for block_size, block_grams in grams.items():
+                        conditions.append(f"(block_size = ? AND gram IN ({', '.join('?' * len(block_grams))}))")
+                        params.extend([block_size, *block_grams])
+                    candidates = catalog.execute(
+                        f"""
+                        SELECT s.sha256, s.md5, s.size, s.magic, s.first_seen, s.fuzzy FROM samples s
+                        WHERE s.sha256 IN (
+                            SELECT sha256 FROM sample_ngrams WHERE {' OR '.join(conditions)}
+                        ) AND s.sha256 != ?
+                        """,
+                        params + [sha256]
+                    ).fetchall()
+                    for other_sha256, other_md5, other_size, other_magic, other_first_seen, other_fuzzy in candidates:
+                        score = fuzzy_hash.compare(fuzzy, other_fuzzy)
+                        if score >= threshold:
+                            similar.append({
+                                "sha256": other_sha256,
+                                "md5hash": other_md5,
+                                "size": other_size,
+                                "type": other_magic,
+                                "score": score,
+                                "timestamp": datetime.datetime.fromtimestamp(other_first_seen).strftime("%Y-%m-%d %H:%M:%S")
+                            })
+                similar.sort(key=lambda entry: entry["score"], reverse=True)
+                pending = catalog.execute("SELECT COUNT(*) FROM samples WHERE fuzzy IS NULL").fetchone()[0]
+
+            return {
+                "success": True,
+                "sample": {
+                    "sha256": sha256,
+                    "md5hash": md5,
+                    "size": size,
+                    "type": magic,
+                    "fuzzy": fuzzy,
+                    "timestamp": datetime.datetime.fromtimestamp(first_seen).strftime("%Y-%m-%d %H:%M:%S")
+                },
+                "similar": similar[:max(1, min(limit, 100))],
+                "pending": pending
+            }
+        
+        except Exception as e:
+            return {
+                "success": False,
+                "message": str(e)
+            }
@@ -0,0 +1,163 @@
+"""
+Parsers for Dionaea bistream files
+
+Each parser takes the path of a bistream file and returns a log entry (dict) or None. Parsers are
+registered per bistream type (the file name prefix, e.g. "httpd"), so new Dionaea services can be
+supported by adding a function decorated with @register("smbd").
+
+Bistream files are Python literals written by Dionaea, so the escapes matched below (\\x00, \\r...)
+are text, not bytes.
+"""
+import re
+from pathlib import Path
+
+MAX_READ = 256 * 1024 # Characters read from a stream, logins and requests come first
+
+PARSERS = {}
+
+HTTP_METHODS = r'(GET|POST|HEAD|PUT|DELETE|OPTIONS|TRACE|CONNECT)'
+HTTP_USER_AGENT = re.compile(r'User-Agent: ([^\\]+)')
+HTTP_REQUEST_TYPE = re.compile(HTTP_METHODS + r'\s')
+HTTP_ENDPOINT = re.compile(HTTP_METHODS + r'\s+(\S+)\s+HTTP')
+HTTP_USERNAME = re.compile(r'username=([^\&]+)')
+HTTP_PASSWORD = re.compile(r'password=([^\']+)')
+HTTP_FILENAME = re.compile(r'filename="([^"]+)"')
+
+FTP_USERNAME = re.compile(r'USER ([^\\]+)')
+FTP_PASSWORD = re.compile(r'PASS ([^\\]+)')
+FTP_FILENAME = re.compile(r'STOR ([^\\]+)')
+
+# Handshake response: <username>\x00 followed by the auth data until the end of the line
+MYSQL_LOGIN = re.compile(r'\\x00\\x00\\x00([a-zA-Z0-9_-]+)\\x00([^\n\r]*)')
+# After the username: \xXX<auth data>\x00')
+MYSQL_AUTH = re.compile(r"\\x[a-fA-F0-9]{2}(.+?)\\x00'\)")
+MYSQL_CANDIDATE = re.compile(r'(?:^|[^\\x])([a-zA-Z][a-zA-Z0-9_@!#$%^&*()+\-]{3,})')
+MYSQL_HEX_ESCAPE = re.compile(r'x[0-9a-fA-F]{2}')
+
+
+def register(log_type):
+    """Registers the decorated function as the parser of `log_type` bistreams"""
+    def decorator(parser):
+        PARSERS[log_type] = parser
+        return parser
+    return decorator
+
+
+def parse_bistream(log_file, log_type):
+    """Converts a Dionaea bistream file to a log entry, None if the type has no parser"""
+    parser = PARSERS.get(log_type)
+    if parser is None:
+        return None
+    return parser(Path(log_file))
+
+
+def _name_fields(log_file):
+    """Returns (src_ip, timestamp) from a bistream file name"""
+    parts = log_file.name.split("-")
+    return parts[3], parts[5] + "-" + parts[6] + "-" + parts[7][:-7]
+
+
+@register("httpd")
+def parse_http(log_file):
+    """HTTP request line: user agent, method, endpoint, credentials and uploaded file"""
+    with open(log_file, 'r') as f:
+        # fist line = request
+        request = f.readline(MAX_READ).strip()
+    ip, date = _name_fields(log_file)
+    user_agent = HTTP_USER_AGENT.search(request)
+    request_type = HTTP_REQUEST_TYPE.search(request)
+    endpoint = HTTP_ENDPOINT.search(request)
+    username = HTTP_USERNAME.search(request)
+    password = HTTP_PASSWORD.search(request)
+    filename = HTTP_FILENAME.search(request)
+
+    log_entry = {"timestamp": date}
+    log_entry["honeypot"] = 'dionaea'
+    log_entry["type"] = 'http'
+
+    if ip:
+        log_entry["src_ip"] = ip
+    if user_agent:
+        log_entry["user_agent"] = user_agent.group(1)
+    if request_type:
+        log_entry["request_type"] = request_type.group(1)
+    if endpoint:
+        log_entry["endpoint"] = endpoint.group(2)
+    if username:
+        log_entry["username"] = username.group(1)
+    if password:
+        log_entry["password"] = password.group(1)
+    if filename:
+        log_entry["filename"] = filename.group(1)
+
+    return log_entry
+
+
+@register("ftpd")
+def parse_ftp(log_file):
+    """FTP session: USER, PASS and the first uploaded (STOR) file"""
+    with open(log_file, 'r') as f:
+        content = f.read(MAX_READ)
+    ip, date = _name_fields(log_file)
+    username = FTP_USERNAME.search(content)
+    password = FTP_PASSWORD.search(content)
+    filename = FTP_FILENAME.search(content)
+
+    log_entry = {"timestamp": date}
+    log_entry["honeypot"] = 'dionaea'
+    log_entry["type"] = 'ftp'
+    log_entry["src_ip"] = ip
+
+    if username:
+        log_entry["username"] = username.group(1)
+    if password:
+        log_entry["password"] = password.group(1)
+    if filename:
+        log_entry["filename"] = filename.group(1)
+
+    return log_entry
+
+
+@register("mysqld")
+def parse_mysql(log_file):
+    """MySQL handshake: username and, when sent in clear text, the password"""
+    with open(log_file, 'r') as f:
+        content = f.read(MAX_READ)
+    ip, date = _name_fields(log_file)
+
+    log_entry = {"timestamp": date}
+    log_entry["honeypot"] = 'dionaea'
+    log_entry["type"] = 'mysql'
+    log_entry["src_ip"] = ip
+
+    login = MYSQL_LOGIN.search(content)
+    if login:
+        username = login.group(1)
+        log_entry["username"] = username
+        log_entry["password"] = _mysql_password(username, login.group(0))
+
+    return log_entry
+
+
+def _mysql_password(username, line):
+    """Extracts the password from the handshake line of `username`"""
+    # username\x00\x00') = no password was sent
+    if username + "\\x00\\x00')" in line:
+        return "Password not sent"
+
+    # username\xXX<password>\x00'), at the first position of the username where it matches
+    auth = None
+    start = line.find(username)
+    while start != -1 and auth is None:
+        auth = MYSQL_AUTH.match(line, start + len(username))
+        start = line.find(username, start + 1)
+    if auth is None:
+        return "Password is hashed"
+
+    valid = [
+        candidate for candidate in MYSQL_CANDIDATE.findall(auth.group(1))
+        if not (candidate[0] == 'x' and len(candidate) > 2 and MYSQL_HEX_ESCAPE.match(candidate))
+    ]
+    if valid:
+        return valid[-1]
+    return "Password is hashed"
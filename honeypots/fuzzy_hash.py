@@ -0,0 +1,132 @@
+"""
+Similarity hashing for captured binaries
+
+ssdeep-style context triggered piecewise hashing: a rolling hash over a 7 byte window splits the
+data into pieces wherever it hits a value depending on the block size, and each piece contributes
+one base64 character. Near-identical payloads share most pieces, so their signatures only differ
+in a few characters. The window and piece hashes use zlib.crc32 instead of ssdeep's own hashes to
+stay fast in pure Python, so signatures are not interchangeable with the ssdeep tool.
+
+Hashes look like "<block size>:<signature>:<signature at double block size>".
+"""
+from zlib import crc32
+
+WINDOW = 7 # Rolling window, also the n-gram length two signatures must share
+MIN_BLOCK_SIZE = 3
+SIGNATURE_LENGTH = 64
+B64 = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+
+
+def _triggers(data, block_size):
+    """(end, window hash) of every position where the rolling window hash triggers `block_size`"""
+    trigger = block_size - 1
+    ends = range(WINDOW, len(data) + 1)
+    windows = map(data.__getitem__, map(slice, range(len(data) - WINDOW + 1), ends))
+    return [(end, h) for end, h in zip(ends, map(crc32, windows)) if h % block_size == trigger]
+
+
+def _signature(data, triggers, block_size, max_length):
+    """Base64 character per piece of `data`, cut where the window hash triggers `block_size`"""
+    trigger = block_size - 1
+    signature = []
+    start = 0
+    for end, window_hash in triggers:
+        if window_hash % block_size == trigger:
+            signature.append(B64[crc32(data[start:end]) & 63])
+            start = end
+            if len(signature) == max_length - 1:
+                break
+    if start < len(data):
+        signature.append(B64[crc32(data[start:]) & 63])
+    return "".join(signature)
+
+
+def fuzzy_hash(data):
+    """Returns the similarity hash of `data` (bytes)"""
+    block_size = MIN_BLOCK_SIZE
+    while block_size * SIGNATURE_LENGTH < len(data):
+        block_size *= 2
+
+    # A block size triggers on a subset of the positions of any smaller one, so the window is
+    # only hashed again if the block size has to be halved more than twice
+    floor = None
+    while True:
+        if floor is None or block_size < floor:
+            floor = max(MIN_BLOCK_SIZE, block_size // 4)
+            triggers = _triggers(data, floor)
+        first = _signature(data, triggers, block_size, SIGNATURE_LENGTH)
+        if block_size > MIN_BLOCK_SIZE and len(first) < SIGNATURE_LENGTH // 2:
+            block_size //= 2
+            continue
+        second = _signature(data, triggers, block_size * 2, SIGNATURE_LENGTH // 2)
+        return f"{block_size}:{first}:{second}"
+
+
+def _strip_runs(signature):
+    """Shortens runs of the same character to 3, they carry little information"""
+    out = []
+    for char in signature:
+        if len(out) < 3 or not (out[-1] == out[-2] == out[-3] == char):
+            out.append(char)
+    return "".join(out)
+
+
+def ngrams(fuzzy):
+    """Returns {(block size, n-gram)} of a hash, used to index candidates for comparison"""
+    block_size, first, second = fuzzy.split(":")
+    block_size = int(block_size)
+    grams = set()
+    for size, signature in ((block_size, _strip_runs(first)), (block_size * 2, _strip_runs(second))):
+        for i in range(len(signature) - WINDOW + 1):
+            grams.add((size, signature[i:i + WINDOW]))
+    return grams
+
+
+def _edit_distance(a, b):
+    """Levenshtein distance with substitutions costing 2 (a delete plus an insert)"""
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (0 if char_a == char_b else 2)
+            ))
+        previous = current
+    return previous[-1]
+
+
+def _score_signatures(a, b, block_size):
+    """0-100 similarity of two signatures computed with the same block size"""
+    if len(a) < WINDOW or len(b) < WINDOW:
+        return 0
+    grams = {a[i:i + WINDOW] for i in range(len(a) - WINDOW + 1)}
+    if not any(b[i:i + WINDOW] in grams for i in range(len(b) - WINDOW + 1)):
+        return 0
+    score = 100 - 100 * _edit_distance(a, b) // (len(a) + len(b))
+    # Small block sizes produce long signatures for tiny inputs, do not overstate matches
+    cap = block_size // MIN_BLOCK_SIZE * min(len(a), len(b))
+    return min(score, cap)
+
+
+def compare(fuzzy_a, fuzzy_b):
+    """Returns the 0-100 similarity of two hashes, 0 when their block sizes are not comparable"""
+    size_a, first_a, second_a = fuzzy_a.split(":")
+    size_b, first_b, second_b = fuzzy_b.split(":")
+    size_a, size_b = int(size_a), int(size_b)
+    first_a, second_a = _strip_runs(first_a), _strip_runs(second_a)
+    first_b, second_b = _strip_runs(first_b), _strip_runs(second_b)
+
+    if size_a == size_b:
+        if first_a == first_b:
+            return 100
+        return max(
+            _score_signatures(first_a, first_b, size_a),
+            _score_signatures(second_a, second_b, size_a * 2)
+        )
+    if size_a == size_b * 2:
+        return _score_signatures(first_a, second_b, size_a)
+    if size_b == size_a * 2:
+        return _score_signatures(second_a, first_b, size_b)
+    return 0
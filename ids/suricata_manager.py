@@ -5,11 +5,18 @@ import re
 import json
 from pathlib import Path
 import requests
+from siem.shipper import LogTail
 
 class SuricataManager:
     def __init__(self):
         self.bin_path = Path("/usr/bin/suricata")
         self.log_path = Path("/var/log/suricata")
+        # Only alerts are shipped, the prefilter skips other events without parsing them
+        self._log_tail = LogTail(
+            lambda: self.log_path / "eve.json",
+            lambda event: self._to_alert(event) if event.get("event_type") == "alert" else None,
+            prefilter=(b'"event_type":"alert"', b'"event_type": "alert"')
+        )
         if self._is_installed():
             print("[+] Suricata detected at: ", self.bin_path)
             print("[+] Suricata logs detected at: ", self.log_path)
@@ -221,24 +228,7 @@ class SuricataManager:
                     "gz": gz
                 }
 
-            alerts_filtered = []
-            for a in alerts:
-                metadata = a.get("alert", {}).get("metadata") or {}
-                alerts_filtered.append({
-                    "source": "suricata",
-                    "timestamp": a["timestamp"][:-12], # 1 | not showing miliseconds and timezone
-                    "src_ip": a["src_ip"], #2
-                    "src_port": a["src_port"], #2
-                    "dest_ip": a["dest_ip"], #2
-                    "dest_port": a["dest_port"], #2
-                    "in_iface": a["in_iface"], #1
-                    "protocol": a["proto"], #1
-                    "app_proto": a["app_proto"] if "app_proto" in a else "N/A", #2
-                    "signature": a["alert"]["signature"] if "signature" in a["alert"] else "N/A", #2 y dudosa: mejor poner respuesta de la API NVD?
-                    "category": a["alert"]["category"] if "category" in a["alert"] else "N/A", #1
-                    "cve": metadata.get("cve", "N/A"), #1
-                    "severity": a["alert"]["severity"] if "severity" in a["alert"] else "N/A", #2
-                })
+            alerts_filtered = [self._to_alert(a) for a in alerts]
             
             next_cursor = start_position + len(alerts)
             prev_cursor = max(0, start_position - page_size)
@@ -263,6 +253,26 @@ class SuricataManager:
                 "gz": gz
             }
 
+    @staticmethod
+    def _to_alert(alert):
+        """Keeps the relevant fields of an eve.json alert"""
+        metadata = alert.get("alert", {}).get("metadata") or {}
+        return {
+            "source": "suricata",
+            "timestamp": alert["timestamp"][:-12], # 1 | not showing miliseconds and timezone
+            "src_ip": alert["src_ip"], #2
+            "src_port": alert["src_port"], #2
+            "dest_ip": alert["dest_ip"], #2
+            "dest_port": alert["dest_port"], #2
+            "in_iface": alert["in_iface"], #1
+            "protocol": alert["proto"], #1
+            "app_proto": alert["app_proto"] if "app_proto" in alert else "N/A", #2
+            "signature": alert["alert"]["signature"] if "signature" in alert["alert"] else "N/A", #2 y dudosa: mejor poner respuesta de la API NVD?
+            "category": alert["alert"]["category"] if "category" in alert["alert"] else "N/A", #1
+            "cve": metadata.get("cve", "N/A"), #1
+            "severity": alert["alert"]["severity"] if "severity" in alert["alert"] else "N/A", #2
+        }
+
     def get_cve_details(self, cve_id):
         """Fetches CVE details from NVD API"""
         try:
@@ -317,6 +327,13 @@ class SuricataManager:
                 "message": str(e)
             }
         
+    def get_new_logs(self, checkpoint, limit):
+        """Alerts appended to eve.json since `checkpoint`, used to ship them to a SIEM
+
+        Returns (alerts, checkpoint), rotated logs are read to the end before the new file.
+        """
+        return self._log_tail(checkpoint, limit)
+
     def get_every_alert(self):
         """Retrieves every single alert from Suricata (it may take a while)"""
         try:
@@ -336,23 +353,7 @@ class SuricataManager:
                             continue
                             
                         alert = json.loads(line)                            
-        
-                        metadata = alert.get("alert", {}).get("metadata") or {}
-                        alerts.append({
-                            "source": "suricata",
-                            "timestamp": alert["timestamp"][:-12], # 1 | not showing miliseconds and timezone
-                            "src_ip": alert["src_ip"], #2
-                            "src_port": alert["src_port"], #2
-                            "dest_ip": alert["dest_ip"], #2
-                            "dest_port": alert["dest_port"], #2
-                            "in_iface": alert["in_iface"], #1
-                            "protocol": alert["proto"], #1
-                            "app_proto": alert["app_proto"] if "app_proto" in alert else "N/A", #2
-                            "signature": alert["alert"]["signature"] if "signature" in alert["alert"] else "N/A", #2 y dudosa: mejor poner respuesta de la API NVD?
-                            "category": alert["alert"]["category"] if "category" in alert["alert"] else "N/A", #1
-                            "cve": metadata.get("cve", "N/A"), #1
-                            "severity": alert["alert"]["severity"] if "severity" in alert["alert"] else "N/A", #2
-                        })
+                        alerts.append(self._to_alert(alert))
                         
             return {
                 "success": True,
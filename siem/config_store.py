@@ -0,0 +1,117 @@
+"""
+Persisted JSON settings shared by the managers
+
+A ConfigStore keeps a JSON file in memory. Reads are served from memory and only reload the file
+when its mtime or size changes (e.g. edited by hand), writes replace it atomically (temporary file
+and rename) so a crash never leaves a half-written file. Encrypted values are decrypted once per
+ciphertext.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from cryptography.fernet import Fernet
+
+
+class ConfigStore:
+    """Settings of one JSON file, e.g. ConfigStore("siem/config.json", key_file="siem/.secret.key")"""
+
+    def __init__(self, path, key_file=None):
+        self.path = Path(path)
+        self.key_file = Path(key_file) if key_file else None # Fernet key of get_secret/set_secret
+        self._data = {}
+        self._signature = None # (mtime_ns, size) of the file last loaded
+        self._cipher = None
+        self._decrypted = {} # ciphertext -> plaintext
+        self.error = None # Why the file could not be parsed, the last good settings are used meanwhile
+        self._lock = threading.RLock()
+
+    def _load(self):
+        """Reloads the file if it changed since it was last read"""
+        try:
+            stat = self.path.stat()
+            signature = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            signature = None
+        if signature == self._signature:
+            return
+        data = {}
+        if signature is not None:
+            try:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+            except ValueError as e:
+                self.error = str(e)
+                return # Half-edited by hand, keep the last good settings until it is fixed
+        self._data = data
+        self._signature = signature
+        self.error = None
+
+    def get(self, key, default=None):
+        """Returns a setting, `default` if it is not set"""
+        with self._lock:
+            self._load()
+            return self._data.get(key, default)
+
+    def data(self):
+        """Returns a copy of every setting"""
+        with self._lock:
+            self._load()
+            return dict(self._data)
+
+    def update(self, **values):
+        """Sets several settings in one write"""
+        with self._lock:
+            self._load()
+            data = dict(self._data, **values)
+            self._write(data)
+            self._data = data
+
+    def set(self, key, value):
+        """Sets one setting"""
+        self.update(**{key: value})
+
+    def _write(self, data):
+        """Writes `data` to a temporary file and renames it over the settings file"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f".{self.path.name}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        stat = self.path.stat()
+        self._signature = (stat.st_mtime_ns, stat.st_size)
+
+    def _get_cipher(self):
+        """Loads the Fernet key, creating it on first use"""
+        if self._cipher is None:
+            if not self.key_file.exists():
+                key = Fernet.generate_key()
+                with open(self.key_file, "wb") as f:
+                    f.write(key)
+            else:
+                with open(self.key_file, "rb") as f:
+                    key = f.read()
+            self._cipher = Fernet(key)
+        return self._cipher
+
+    def get_secret(self, key, default=""):
+        """Returns a decrypted setting, values that are not encrypted are returned as they are"""
+        with self._lock:
+            value = self.get(key)
+            if not value:
+                return default
+            if value not in self._decrypted:
+                try:
+                    self._decrypted[value] = self._get_cipher().decrypt(value.encode()).decode()
+                except Exception:
+                    self._decrypted[value] = value
+            return self._decrypted[value]
+
+    def set_secret(self, key, value):
+        """Encrypts and sets a setting"""
+        with self._lock:
+            encrypted = self._get_cipher().encrypt(value.encode()).decode()
+            self._decrypted[encrypted] = value
+            self.set(key, encrypted)
@@ -0,0 +1,281 @@
+"""
+Background event forwarder with an on-disk spool
+
+Submitted events are written to an append-only spool file per job before the API answers, then a
+worker thread delivers them in batches. The byte offset of the last delivered batch is saved after
+each success, so a failed batch is retried with backoff and, after a restart, jobs resume from the
+spool. Delivery is at-least-once: a crash between a batch being accepted and its offset being saved
+sends that batch again.
+
+Batches are bounded both by events and by bytes, so they stay under the receiver's maximum request
+size whatever the size of the events.
+
+When the receiver acknowledges batches asynchronously (Splunk HEC indexer acknowledgement), the
+saved offset only covers acknowledged batches, so events the receiver accepted but lost are sent
+again.
+"""
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+
+
+class RejectedBatch(Exception):
+    """Raised by `send` when retrying a batch cannot succeed (e.g. HTTP 400/413), it is dropped
+
+    `dropped` is the number of events of the batch that were rejected, all of them by default.
+    """
+
+    def __init__(self, message, dropped=None):
+        super().__init__(message)
+        self.dropped = dropped
+
+
+class Forwarder:
+    """Delivers spooled events through `send(lines)`, which raises on failure
+
+    `lines` are the serialized events of a batch, each one ending with a newline. If `ack` is
+    given, `send` returns an ack id (None when there is nothing to wait for) and `ack(ack_ids)`
+    returns the ids the receiver confirmed, otherwise accepted batches count as delivered.
+    """
+
+    def __init__(self, send, spool_dir, batch_events=5000, batch_bytes=1000000, queue_size=64,
+                 retry_base=1, retry_max=60, ack=None, ack_interval=2, ack_timeout=300, max_pending=16):
+        self.send = send
+        self.ack = ack
+        self.ack_interval = ack_interval # Seconds between ack polls
+        self.ack_timeout = ack_timeout # Seconds before an unacknowledged batch is sent again
+        self.max_pending = max_pending # Batches sent ahead while waiting for acks
+        self.spool_dir = Path(spool_dir)
+        self.batch_events = batch_events
+        self.batch_bytes = batch_bytes # Or a callable returning it per batch, an event larger than this is sent alone
+        self.retry_base = retry_base # Seconds before the first retry, doubled on each failure
+        self.retry_max = retry_max
+        self.keep_finished = 1000 # Finished jobs whose state is kept for status queries
+        self._queue = queue.Queue(maxsize=queue_size) # Job ids, jobs that do not fit stay spooled
+        self._jobs = {}
+        self._jobs_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.last_delivery = time.monotonic() # When a batch was last delivered (or dropped)
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, lines):
+        """Spools serialized events (an iterable of bytes, one per event) and returns the job id"""
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        job_id = uuid.uuid4().hex
+        tmp = self.spool_dir / f"{job_id}.tmp"
+        total = 0
+        with open(tmp, "wb") as f:
+            for line in lines:
+                f.write(line)
+                f.write(b"\n")
+                total += 1
+            f.flush()
+            os.fsync(f.fileno())
+
+        # Registered before the rename, once spooled the worker may deliver it right away
+        with self._jobs_lock:
+            self._jobs[job_id] = {"status": "queued", "total": total, "sent": 0, "dropped": 0, "pending_ack": 0, "attempts": 0, "error": None}
+            finished = [key for key, job in self._jobs.items() if job["status"] in ("done", "failed")]
+            for key in finished[:-self.keep_finished or None]:
+                del self._jobs[key]
+        tmp.rename(self.spool_dir / f"{job_id}.ndjson")
+        try:
+            self._queue.put_nowait(job_id)
+        except queue.Full:
+            pass # Picked up from the spool once the queue drains
+        return job_id
+
+    def status(self, job_id):
+        """Returns a copy of the job state, None for unknown jobs"""
+        with self._jobs_lock:
+            job = self._jobs.get(job_id)
+            return dict(job, job_id=job_id) if job else None
+
+    def spooled_bytes(self):
+        """Size of the spooled jobs, delivered parts of unfinished jobs included"""
+        if not self.spool_dir.exists():
+            return 0
+        total = 0
+        for path in self.spool_dir.glob("*.ndjson"):
+            try:
+                total += path.stat().st_size
+            except OSError:
+                continue # Finished meanwhile
+        return total
+
+    def close(self):
+        """Stops the worker, undelivered events stay in the spool"""
+        self._stop.set()
+
+    def _run(self):
+        """Delivers queued jobs, and spooled jobs left by overflows or a previous run when idle"""
+        while not self._stop.is_set():
+            job_id = None
+            try:
+                try:
+                    job_id = self._queue.get(timeout=5)
+                except queue.Empty:
+                    job_id = self._next_spooled()
+                    if job_id is None:
+                        continue
+                self._deliver(job_id)
+            except Exception as e:
+                # A broken job must not stop the worker, it is set aside for inspection
+                if job_id is not None:
+                    self._quarantine(job_id, e)
+                elif self._stop.wait(self.retry_base):
+                    return
+
+    def _quarantine(self, job_id, error):
+        """Moves the spool files of a job that cannot be delivered to spool/failed/"""
+        failed_dir = self.spool_dir / "failed"
+        failed_dir.mkdir(parents=True, exist_ok=True)
+        for suffix in (".ndjson", ".offset"):
+            path = self.spool_dir / f"{job_id}{suffix}"
+            try:
+                path.replace(failed_dir / path.name)
+            except FileNotFoundError:
+                continue
+        self._update(job_id, status="failed", error=f"Job set aside in {failed_dir}: {error}")
+
+    def _next_spooled(self):
+        """Returns the oldest spooled job that is not finished"""
+        if not self.spool_dir.exists():
+            return None
+        spooled = sorted(self.spool_dir.glob("*.ndjson"), key=lambda path: path.stat().st_mtime)
+        for path in spooled:
+            job_id = path.stem
+            with self._jobs_lock:
+                if job_id not in self._jobs:
+                    with open(path, "rb") as f:
+                        total = sum(1 for _ in f)
+                    self._jobs[job_id] = {"status": "queued", "total": total, "sent": 0, "dropped": 0, "pending_ack": 0, "attempts": 0, "error": None}
+            return job_id
+        return None
+
+    def _deliver(self, job_id):
+        """Sends a job's remaining batches, retrying each one until it is accepted or we stop
+
+        With `ack`, the saved offset only moves past batches the receiver acknowledged. Up to
+        `max_pending` batches are sent while earlier ones wait for their ack, and if the oldest
+        is not acknowledged within `ack_timeout`, everything after the saved offset is sent again.
+        """
+        path = self.spool_dir / f"{job_id}.ndjson"
+        offset_file = self.spool_dir / f"{job_id}.offset"
+        if not path.exists():
+            return
+        offset, sent, dropped = 0, 0, 0
+        if offset_file.exists():
+            offset, sent, dropped = (int(value) for value in offset_file.read_text().split())
+
+        rejection = None
+        pending = deque() # Sent batches in spool order, committed once they are acknowledged
+        last_poll = time.monotonic()
+        with open(path, "rb") as f:
+            f.seek(offset)
+            self._update(job_id, status="sending", sent=sent, dropped=dropped)
+            while True:
+                batch = None
+                if len(pending) < self.max_pending:
+                    batch = self._read_batch(f)
+                if batch:
+                    outcome = self._send(job_id, batch)
+                    if outcome is None:
+                        return
+                    ack_id, error, rejected = outcome
+                    if error:
+                        rejection = error
+                    pending.append({
+                        "ack_id": ack_id,
+                        "acked": ack_id is None, # Nothing to wait for
+                        "dropped": rejected,
+                        "events": len(batch),
+                        "end": f.tell(),
+                        "sent_at": time.monotonic()
+                    })
+                elif not pending:
+                    break
+                elif self._stop.wait(self.ack_interval):
+                    return # Unacknowledged batches are sent again on the next run
+
+                waiting = [entry for entry in pending if not entry["acked"]]
+                if waiting and (not batch or time.monotonic() - last_poll >= self.ack_interval):
+                    last_poll = time.monotonic()
+                    try:
+                        acked = self.ack([entry["ack_id"] for entry in waiting])
+                        for entry in waiting:
+                            entry["acked"] = entry["ack_id"] in acked
+                    except Exception as e:
+                        self._update(job_id, error=f"Ack polling failed: {e}")
+                    if not pending[0]["acked"] and time.monotonic() - pending[0]["sent_at"] > self.ack_timeout:
+                        # Lost, e.g. the indexer restarted: resend from the last acknowledged batch
+                        f.seek(offset)
+                        pending.clear()
+                        self._update(job_id, status="retrying", error="Batch not acknowledged in time", attempts=1, pending_ack=0)
+                        continue
+
+                committed = False
+                while pending and pending[0]["acked"]:
+                    entry = pending.popleft()
+                    offset = entry["end"]
+                    dropped += entry["dropped"]
+                    sent += entry["events"] - entry["dropped"]
+                    committed = True
+                if committed:
+                    tmp = self.spool_dir / f"{job_id}.offset.tmp"
+                    with open(tmp, "w") as offset_tmp:
+                        offset_tmp.write(f"{offset} {sent} {dropped}")
+                        offset_tmp.flush()
+                        os.fsync(offset_tmp.fileno())
+                    tmp.replace(offset_file)
+                    self.last_delivery = time.monotonic()
+                    self._update(job_id, status="sending", sent=sent, dropped=dropped, error=rejection)
+                self._update(job_id, pending_ack=sum(entry["events"] for entry in pending))
+
+        path.unlink()
+        offset_file.unlink(missing_ok=True)
+        self._update(job_id, status="done")
+
+    def _send(self, job_id, batch):
+        """Sends a batch until it is accepted, returns (ack id, rejection, events dropped), None if we stop"""
+        delay = self.retry_base
+        while True:
+            try:
+                ack_id = self.send(batch)
+                return (ack_id if self.ack else None), None, 0
+            except RejectedBatch as e:
+                return None, str(e), len(batch) if e.dropped is None else e.dropped
+            except Exception as e:
+                self._update(job_id, status="retrying", error=str(e), attempts=1)
+                if self._stop.wait(delay):
+                    return None
+                delay = min(delay * 2, self.retry_max)
+
+    def _read_batch(self, f):
+        """Reads the next lines of a spool file up to `batch_events` events and `batch_bytes` bytes"""
+        batch = []
+        size = 0
+        batch_bytes = self.batch_bytes() if callable(self.batch_bytes) else self.batch_bytes
+        while len(batch) < self.batch_events:
+            position = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            if batch and size + len(line) > batch_bytes:
+                f.seek(position) # Starts the next batch
+                break
+            batch.append(line)
+            size += len(line)
+        return batch
+
+    def _update(self, job_id, attempts=0, **fields):
+        """Updates the in-memory state of a job"""
+        with self._jobs_lock:
+            job = self._jobs.setdefault(job_id, {"status": "queued", "total": 0, "sent": 0, "dropped": 0, "pending_ack": 0, "attempts": 0, "error": None})
+            job.update(fields)
+            job["attempts"] += attempts
+            job["updated"] = time.time()
@@ -0,0 +1,166 @@
+"""
+Server-side shipping of honeypot and IDS events to Splunk
+
+A background thread polls every source for the events added since its checkpoint and hands them
+to the Splunk forwarder, without the browser fetching the logs and posting them back. Checkpoints
+are saved after the events are spooled, so a restart resumes where it stopped. A crash between
+the two ships the last events again (at-least-once, like the forwarder).
+
+A source is a callable `read(checkpoint, limit)` returning `(events, checkpoint)`, where
+`checkpoint` is whatever JSON-serializable value the source needs (None on the first run). A
+source may return fewer events than `limit` (e.g. files without a parser), it has nothing more to
+read once it returns its checkpoint unchanged.
+"""
+import json
+import threading
+import time
+from siem.config_store import ConfigStore
+
+
+class LogTail:
+    """Source reading new lines of a JSON lines log (cowrie.json, eve.json)
+
+    The checkpoint is the inode and byte offset of the last complete line read. When the log is
+    rotated by renaming, the rest of the old file is read first from its new name, when it is
+    truncated in place, reading starts over.
+    """
+
+    def __init__(self, log_file, to_event, prefilter=()):
+        self.log_file = log_file # Callable returning the current log Path, None if unknown
+        self.to_event = to_event # Parsed line -> event, None to skip it
+        self.prefilter = prefilter # Lines are skipped unless they contain one of these bytes
+
+    def __call__(self, checkpoint, limit):
+        path = self.log_file()
+        if path is None or not path.exists():
+            return [], checkpoint
+        stat = path.stat()
+        inode = (checkpoint or {}).get("inode")
+        offset = (checkpoint or {}).get("offset", 0)
+
+        events = []
+        if inode is not None and inode != stat.st_ino:
+            rotated = self._find_rotated(path, inode)
+            if rotated is not None:
+                offset, finished = self._read(rotated, offset, limit, events)
+                if not finished:
+                    return events, {"inode": inode, "offset": offset}
+            inode, offset = None, 0
+        if inode is None:
+            inode = stat.st_ino
+        if offset > stat.st_size:
+            offset = 0 # Truncated (copytruncate)
+
+        offset, _ = self._read(path, offset, limit - len(events), events)
+        return events, {"inode": inode, "offset": offset}
+
+    def _find_rotated(self, path, inode):
+        """Returns the rotated copy of the log with `inode` (e.g. cowrie.json.2024-01-01), if any"""
+        for rotated in path.parent.glob(path.name + ".*"):
+            try:
+                if rotated.stat().st_ino == inode:
+                    return rotated
+            except OSError:
+                continue
+        return None
+
+    def _read(self, path, offset, limit, events):
+        """Appends events from complete lines after `offset`, returns (offset, reached the end)"""
+        with open(path, "rb") as f:
+            f.seek(offset)
+            while len(events) < limit:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    return offset, True # A partial line is read again once complete
+                offset += len(line)
+                if self.prefilter and not any(text in line for text in self.prefilter):
+                    continue
+                try:
+                    event = self.to_event(json.loads(line))
+                except (ValueError, KeyError, TypeError):
+                    continue
+                if event is not None:
+                    events.append(event)
+        return offset, False
+
+
+class Shipper:
+    """Ships new events of every source through `submit(events)`
+
+    `submit` returns a result dict with `success` and the `jobs` ({sink: job id}) it created.
+    """
+
+    def __init__(self, submit, sources, state_file, interval=30, batch_events=5000):
+        self.submit = submit
+        self.sources = sources # name -> read(checkpoint, limit)
+        self.state = ConfigStore(state_file) # "enabled" flag and per-source "checkpoints"
+        self.interval = interval # Seconds between polls
+        self.batch_events = batch_events # Events read from a source per job
+        self._checkpoints = dict(self.state.get("checkpoints", {}))
+        self._status = {name: {"shipped": 0, "last_run": None, "last_jobs": None, "error": None} for name in sources}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def set_enabled(self, enabled):
+        """Turns shipping on or off, persisted across restarts"""
+        self.state.set("enabled", bool(enabled))
+        if enabled:
+            self._wake.set()
+
+    def status(self):
+        """Returns whether shipping is enabled and the per-source counters"""
+        with self._lock:
+            return {
+                "enabled": self.state.get("enabled", False),
+                "interval": self.interval,
+                "sources": {name: dict(status) for name, status in self._status.items()}
+            }
+
+    def close(self):
+        """Stops polling, checkpoints are already saved"""
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self):
+        """Polls the sources every `interval` seconds while enabled"""
+        while not self._stop.is_set():
+            if self.state.get("enabled", False):
+                for name in self.sources:
+                    if self._stop.is_set():
+                        break
+                    self._ship(name)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _ship(self, name):
+        """Ships everything a source has after its checkpoint, one job per read of up to `batch_events` events"""
+        read = self.sources[name]
+        while not self._stop.is_set():
+            checkpoint = self._checkpoints.get(name)
+            try:
+                events, new_checkpoint = read(checkpoint, self.batch_events)
+                jobs = None
+                if events:
+                    result = self.submit(events)
+                    if not result.get("success"):
+                        raise RuntimeError(result.get("message"))
+                    jobs = result.get("jobs")
+            except Exception as e:
+                with self._lock:
+                    self._status[name].update(last_run=time.time(), error=str(e))
+                return
+
+            with self._lock:
+                if new_checkpoint != checkpoint:
+                    # Written atomically, a crash leaves either the old or the new checkpoints
+                    self._checkpoints[name] = new_checkpoint
+                    self.state.set("checkpoints", dict(self._checkpoints))
+                status = self._status[name]
+                status["shipped"] += len(events)
+                status.update(last_run=time.time(), error=None)
+                if jobs:
+                    status["last_jobs"] = jobs
+            if new_checkpoint == checkpoint:
+                return # Exhausted, a short read may still be followed by more
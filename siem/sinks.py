@@ -0,0 +1,319 @@
+"""
+Output pipeline fanning events out to several SIEM destinations
+
+Every sink gets its own Forwarder (spool directory, batching and retries), so a slow or down
+destination never holds back the others. The pipeline refuses new events while any spool is over
+`max_spool_bytes`, so the shipper stops reading sources instead of filling the disk, and resumes
+from its checkpoints once the sinks drain. A sink that stays backed up without delivering anything
+for `stall_timeout` is skipped instead, so a permanently failing destination cannot stop the rest.
+
+A sink formats each event into one line (`format`) and writes a batch of those lines (`send`,
+each line ending with a newline), raising on failure like the Forwarder's `send`:
+
+    HecSink     Splunk HTTP Event Collector, through SplunkManager
+    BulkSink    Elasticsearch/OpenSearch compatible `_bulk` API (NDJSON)
+    SyslogSink  RFC 5424 syslog over TCP (octet counting framing) or UDP
+    FileSink    Local NDJSON file, rotated by size
+
+Sinks besides HEC are configured in siem/sinks.json, e.g.
+    {"hec": true, "sinks": [{"type": "syslog", "name": "syslog", "host": "10.0.0.5", "port": 6514}]}
+"""
+import datetime
+import errno
+import json
+import os
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+import requests
+from requests.adapters import HTTPAdapter
+from siem.forwarder import Forwarder, RejectedBatch
+
+
+class Sink(ABC):
+    """Base class of the pipeline destinations"""
+    name = "sink"
+    batch_events = 5000
+    batch_bytes = 1000000 # Or a callable returning it, read for every batch
+    ack = None # Optional ack(ack_ids) for receivers that confirm batches later, see Forwarder
+
+    def format(self, event):
+        """Serializes one event into a line (bytes, without the newline)"""
+        return json.dumps(event).encode()
+
+    @abstractmethod
+    def send(self, lines):
+        """Writes a batch of formatted lines, raising if it was not accepted"""
+
+    def close(self):
+        """Releases connections or files"""
+
+
+class HecSink(Sink):
+    """Splunk HEC, sharing SplunkManager's pooled session, size limit and acknowledgements"""
+
+    def __init__(self, splunk, name="hec", sourcetype="honeydash", index="main"):
+        self.splunk = splunk
+        self.name = name
+        self.sourcetype = sourcetype
+        self.index = index
+        self.batch_bytes = lambda: splunk.hec_max_content_length # Read per batch, it can be changed at runtime
+        self.ack = splunk._query_hec_acks # Only polled for batches sent while hec_ack is on
+
+    def format(self, event):
+        return json.dumps({"event": event, "sourcetype": self.sourcetype, "index": self.index}).encode()
+
+    def send(self, lines):
+        return self.splunk._post_hec(lines)
+
+
+class BulkSink(Sink):
+    """Elasticsearch/OpenSearch `_bulk` API, one index action per event"""
+
+    def __init__(self, url, index="honeydash", name="bulk", username=None, password=None,
+                 api_key=None, verify=True, pool_size=4, timeout=(5, 60), batch_bytes=5000000):
+        self.url = url.rstrip("/") + "/_bulk"
+        self.name = name
+        self.batch_bytes = batch_bytes
+        self.timeout = timeout
+        self._action = json.dumps({"index": {"_index": index}}).encode() + b"\n"
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._session.verify = verify
+        self._session.headers["Content-Type"] = "application/x-ndjson"
+        if api_key:
+            self._session.headers["Authorization"] = f"ApiKey {api_key}"
+        elif username:
+            self._session.auth = (username, password or "")
+
+    def send(self, lines):
+        payload = b"".join(self._action + line for line in lines)
+        r = self._session.post(self.url, data=payload, timeout=self.timeout)
+        if r.status_code in (400, 413):
+            raise RejectedBatch(f"Batch rejected by {self.name}: {r.text[:200]}")
+        if r.status_code != 200:
+            raise RuntimeError(f"Failed to send events to {self.name}: HTTP {r.status_code}")
+        response = r.json()
+        if response.get("errors"):
+            # Full queues and node failures are retried with the whole batch, rejected documents
+            # (e.g. mapping conflicts) fail again on retry, they are counted as dropped
+            results = [item.get("index", {}) for item in response.get("items", [])]
+            if any(result.get("status") == 429 or (result.get("status") or 0) >= 500 for result in results):
+                raise RuntimeError(f"{self.name} is overloaded or failing, retrying the batch")
+            failed = [result for result in results if (result.get("status") or 0) >= 300]
+            if failed:
+                reason = (failed[0].get("error") or {}).get("reason", failed[0].get("error"))
+                raise RejectedBatch(f"{len(failed)} events rejected by {self.name}: {reason}", dropped=len(failed))
+
+    def close(self):
+        self._session.close()
+
+
+class SyslogSink(Sink):
+    """RFC 5424 syslog, the event as JSON in the message
+
+    TCP uses one persistent connection and octet counting framing (RFC 6587), UDP sends one
+    datagram per event. Events that do not fit in a datagram (`max_datagram` bytes) are dropped,
+    they would be refused again on every retry. The severity follows the event's `severity`
+    field when it has one.
+    """
+    SEVERITIES = {
+        "critical": 2, "high": 3, "medium": 4, "low": 5, "info": 6,
+        1: 3, 2: 4, 3: 5 # Suricata alert severities
+    }
+
+    def __init__(self, host, port=514, protocol="tcp", name="syslog", facility=16, app_name="honeydash",
+                 timeout=10, max_datagram=65000):
+        self.address = (host, port)
+        self.protocol = protocol
+        self.name = name
+        self.facility = facility # 16 = local0
+        self.app_name = app_name
+        self.hostname = socket.gethostname()
+        self.timeout = timeout
+        self.max_datagram = max_datagram # IPv4 UDP payloads are limited to 65507 bytes
+        self.batch_bytes = 1000000 if protocol == "tcp" else 60000
+        self._socket = None
+        self._lock = threading.Lock()
+
+    def format(self, event):
+        severity = self.SEVERITIES.get(event.get("severity"), 5) # notice
+        timestamp = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="microseconds").replace("+00:00", "Z")
+        msgid = event.get("honeypot") or event.get("source") or "-"
+        header = f"<{self.facility * 8 + severity}>1 {timestamp} {self.hostname} {self.app_name} - {msgid} - "
+        return header.encode() + json.dumps(event).encode()
+
+    def send(self, lines):
+        with self._lock:
+            try:
+                if self.protocol == "udp":
+                    if self._socket is None:
+                        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                    oversized = 0
+                    for line in lines:
+                        if len(line) - 1 > self.max_datagram:
+                            oversized += 1
+                            continue
+                        try:
+                            self._socket.sendto(line[:-1], self.address)
+                        except OSError as e:
+                            if e.errno != errno.EMSGSIZE:
+                                raise
+                            oversized += 1
+                    if oversized:
+                        raise RejectedBatch(f"{oversized} events too large for a syslog datagram", dropped=oversized)
+                    return
+                if self._socket is None:
+                    self._socket = socket.create_connection(self.address, timeout=self.timeout)
+                self._socket.sendall(b"".join(b"%d %s" % (len(line) - 1, line[:-1]) for line in lines))
+            except OSError:
+                self._close_socket() # Reconnect on the retry
+                raise
+
+    def _close_socket(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def close(self):
+        with self._lock:
+            self._close_socket()
+
+
+class FileSink(Sink):
+    """Appends events to a local NDJSON file, rotated to .1, .2... when it reaches `max_bytes`"""
+
+    def __init__(self, path, name="file", max_bytes=100 * 1024 * 1024, backups=5):
+        self.path = Path(path)
+        self.name = name
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+    def send(self, lines):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists() and self.path.stat().st_size >= self.max_bytes:
+            self._rotate()
+        with open(self.path, "ab") as f:
+            f.write(b"".join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rotate(self):
+        """events.ndjson -> events.ndjson.1 -> ... -> events.ndjson.<backups> (dropped)"""
+        for i in range(self.backups - 1, 0, -1):
+            older = self.path.with_name(f"{self.path.name}.{i}")
+            if older.exists():
+                older.replace(self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backups:
+            self.path.replace(self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+
+
+SINK_TYPES = {
+    "bulk": BulkSink,
+    "syslog": SyslogSink,
+    "file": FileSink
+}
+
+
+def load_sinks(configs):
+    """Builds sinks from siem/sinks.json entries ({"type": "bulk", "url": ...})"""
+    if not isinstance(configs, list):
+        raise ValueError("'sinks' must be a list of sink settings")
+    sinks = []
+    for config in configs:
+        if not isinstance(config, dict):
+            raise ValueError(f"Sink settings must be objects: {config!r}")
+        config = dict(config)
+        sink_type = config.pop("type", None)
+        if sink_type not in SINK_TYPES:
+            raise ValueError(f"Unknown sink type: {sink_type}")
+        try:
+            sinks.append(SINK_TYPES[sink_type](**config))
+        except TypeError as e:
+            raise ValueError(f"Invalid {sink_type} sink settings: {e}")
+    return sinks
+
+
+class SinkPipeline:
+    """Fans each submitted set of events out to every sink, through one Forwarder per sink"""
+
+    def __init__(self, sinks, spool_dir, max_spool_bytes=100 * 1024 * 1024, stall_timeout=600):
+        names = [sink.name for sink in sinks]
+        if len(set(names)) != len(names):
+            raise ValueError("Sink names must be unique, they name the spool directories")
+        self.sinks = sinks
+        self.spool_dir = Path(spool_dir)
+        self.max_spool_bytes = max_spool_bytes # Per sink, new events are refused above it
+        self.stall_timeout = stall_timeout # Seconds without deliveries before a backed up sink is skipped
+        self.skipped = {sink.name: 0 for sink in sinks} # Events not spooled for stalled sinks
+        self._backed_up_since = {} # name -> monotonic time its spool went over max_spool_bytes
+        self.forwarders = {
+            sink.name: Forwarder(
+                sink.send, self.spool_dir / sink.name, batch_events=sink.batch_events,
+                batch_bytes=sink.batch_bytes, ack=sink.ack
+            )
+            for sink in sinks
+        }
+
+    def submit(self, events):
+        """Spools events for every sink, or for none if one of them is backed up
+
+        A sink backed up for `stall_timeout` seconds without delivering anything (down, or
+        failing every batch) no longer holds back the others: its events are skipped and counted
+        until it delivers again.
+        """
+        backed_up = []
+        stalled = []
+        now = time.monotonic()
+        for name, forwarder in self.forwarders.items():
+            if forwarder.spooled_bytes() <= self.max_spool_bytes:
+                self._backed_up_since.pop(name, None)
+                continue
+            since = self._backed_up_since.setdefault(name, now)
+            if now - max(since, forwarder.last_delivery) > self.stall_timeout:
+                stalled.append(name)
+            else:
+                backed_up.append(name)
+        if backed_up:
+            return {
+                "success": False,
+                "message": f"Sinks backed up, waiting for them to drain: {', '.join(backed_up)}"
+            }
+
+        jobs = {}
+        for sink in self.sinks:
+            if sink.name in stalled:
+                self.skipped[sink.name] += len(events)
+                continue
+            jobs[sink.name] = self.forwarders[sink.name].submit(sink.format(event) for event in events)
+        return {
+            "success": True,
+            "jobs": jobs,
+            "size": len(events),
+            "message": f"{len(events)} events queued for {len(jobs)} sinks"
+            + (f", skipped for stalled sinks: {', '.join(stalled)}" if stalled else "")
+        }
+
+    def status(self):
+        """Returns the spooled (undelivered) bytes and skipped events of every sink"""
+        return {
+            sink.name: {
+                "type": type(sink).__name__,
+                "spooled_bytes": self.forwarders[sink.name].spooled_bytes(),
+                "skipped": self.skipped[sink.name]
+            }
+            for sink in self.sinks
+        }
+
+    def close(self):
+        """Stops the forwarders and closes the sinks, undelivered events stay spooled"""
+        for forwarder in self.forwarders.values():
+            forwarder.close()
+        for sink in self.sinks:
+            sink.close()
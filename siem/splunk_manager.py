@@ -2,10 +2,18 @@ import json
 import subprocess
 from pathlib import Path
 import base64
+import gzip
+import threading
+import time
+import uuid
 import requests
+from requests.adapters import HTTPAdapter
 from flask import jsonify
 import urllib3
-from cryptography.fernet import Fernet
+from siem.config_store import ConfigStore
+from siem.forwarder import Forwarder, RejectedBatch
+from siem.shipper import Shipper
+from siem.sinks import HecSink, SinkPipeline, load_sinks
 
 # Disable SSL warnings for self-signed certificates in local development
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -13,12 +21,29 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 class SplunkManager:
     def __init__(self):
         self.splunk_path = Path("/opt/splunk") # Default Splunk path
-        self.splunk_user = self.get_user() # Get username from config file
-        self.splunk_password = self.get_pass() # Get password from config file
+        self.config = ConfigStore("siem/config.json", key_file="siem/.secret.key") # Loaded once, reloaded on external edits
         self.creds = None # Will be "OK" when credentials are set and valid
         self.splunk_host = "https://localhost:8089" # Default Splunk host
         self.splunk_hec_url = "https://localhost:8088/services/collector" # Default HEC URL
         self.splunk_hec_token = None # Will be set when created or found
+        self.pool_size = 4 # Keep-alive connections per endpoint
+        self.timeout = (5, 60) # Connect and read timeouts (seconds)
+        self.probe_timeout = (2, 5) # Timeouts of the server/info status probe
+        self.token_ttl = 60 # Seconds a token/credentials check is reused
+        self._token_check = None # (time, result) of the last conclusive search_token()
+        self._token_lock = threading.Lock()
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+        self.hec_channel = str(uuid.uuid4()) # X-Splunk-Request-Channel, ack ids are per channel
+        # _post_hec only returns ack ids while hec_ack is on, otherwise batches count as delivered
+        self.forwarder = Forwarder(
+            self._post_hec, Path("siem/spool"), batch_bytes=lambda: self.hec_max_content_length,
+            ack=self._query_hec_acks
+        ) # Delivers /api/splunk/send jobs
+        self.shipper = None # Ships new events of every source, see start_shipper()
+        self.pipeline = None # Fans shipped events out to HEC and the other sinks
+        self.sinks_error = None # Why siem/sinks.json was ignored, if it was
+        self.ship_interval = 30 # Seconds between shipper polls
         if self._is_installed():
             print("[+] Splunk detected at: ", self.splunk_path)
         else:
@@ -41,10 +66,7 @@ class SplunkManager:
                 }
         
         try:
-            result = subprocess.run([self.splunk_path / "bin/splunk", "status"], 
-                                    capture_output=True, text=True)
-
-            if "splunkd is running" in result.stdout:
+            if self._is_running():
                 self.search_token()
                 return {"installed": True, "running": True, "token": self.splunk_hec_token, "splunk_path": str(self.splunk_path), "user": self.splunk_user, "password": self.splunk_password, "creds": self.creds}
             else:
@@ -56,54 +78,114 @@ class SplunkManager:
                     "message": "Error checking Splunk status"}
 
 
-    def _get_cipher(self):
-        key_file = Path("siem/.secret.key")
-        if not key_file.exists():
-            key = Fernet.generate_key()
-            with open(key_file, "wb") as f:
-                f.write(key)
-        else:
-            with open(key_file, "rb") as f:
-                key = f.read()
-        return Fernet(key)
+    def _is_running(self):
+        """Checks splunkd with a server/info request on the pooled management connection
 
+        Any HTTP answer, even 401 with wrong credentials, means splunkd is up.
+        """
+        try:
+            self._management_session().get(
+                f"{self.splunk_host}/services/server/info?output_mode=json", timeout=self.probe_timeout
+            )
+            return True
+        except requests.RequestException:
+            return False
+
+    def _invalidate_token_check(self):
+        """Forgets the cached token/credentials check, e.g. after the credentials change"""
+        with self._token_lock:
+            self._token_check = None
+
+    def _session(self, name):
+        """Returns the keep-alive session of an endpoint ("management" on 8089, "hec" on 8088)
+
+        Sessions keep up to `pool_size` TLS connections open, so requests after the first one
+        skip the TCP and TLS handshakes.
+        """
+        with self._sessions_lock:
+            session = self._sessions.get(name)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.verify = False
+                self._sessions[name] = session
+            return session
+
+    def _management_session(self):
+        """Session for the management API, authenticated with the current credentials"""
+        session = self._session("management")
+        auth = base64.b64encode(f"{self.splunk_user}:{self.splunk_password}".encode()).decode()
+        session.headers["Authorization"] = f"Basic {auth}"
+        return session
+
+    def _hec_session(self):
+        """Session for the HTTP Event Collector, authenticated with the HoneyDash token"""
+        session = self._session("hec")
+        session.headers["Authorization"] = f"Splunk {self.splunk_hec_token}"
+        session.headers["Content-Type"] = "application/json"
+        if self.hec_ack:
+            session.headers["X-Splunk-Request-Channel"] = self.hec_channel
+        else:
+            session.headers.pop("X-Splunk-Request-Channel", None)
+        return session
+
+    def close(self):
+        """Stops the shipper and the forwarder and closes the pooled connections"""
+        if self.shipper is not None:
+            self.shipper.close()
+            self.pipeline.close()
+        self.forwarder.close()
+        with self._sessions_lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+    @property
+    def hec_ack(self):
+        """Wait for indexer acknowledgement (the token must have useACK enabled), read per batch"""
+        return self.config.get("hec_ack", False)
+
+    @property
+    def hec_max_content_length(self):
+        """HEC [http] max_content_length bounding each batch, 1 MB on older Splunk versions, read per batch"""
+        return self.config.get("hec_max_content_length", 1000000)
+
+    @property
+    def hec_gzip(self):
+        """Compress HEC requests (Content-Encoding: gzip), read per batch"""
+        return self.config.get("hec_gzip", False)
+
+    @property
+    def splunk_user(self):
+        """Splunk username, from the config store so external edits are picked up"""
+        return self.get_user()
+
+    @property
+    def splunk_password(self):
+        """Splunk password, decrypted once per value by the config store"""
+        return self.get_pass()
 
     def get_user(self):
         """Get the Splunk username from config file"""
         try:
-            with open("siem/config.json", "r") as f:
-                user = json.load(f)
-                return user.get("splunk_user")
+            return self.config.get("splunk_user", "")
         except Exception:
             return ""
 
     def get_pass(self):
         """Get the Splunk password from config file"""
         try:
-            with open("siem/config.json", "r") as f:
-                config = json.load(f)
-                pass_enc = config.get("splunk_pass")
-                if pass_enc:
-                    cipher = self._get_cipher()
-                    try:
-                        return cipher.decrypt(pass_enc.encode()).decode()
-                    except Exception:
-                        return pass_enc
+            return self.config.get_secret("splunk_pass")
         except Exception:
-            pass
-        return ""
+            return ""
 
     def set_user(self, username):
         """Set the Splunk username in config file"""
         try:
-            config = {}
-            if Path("siem/config.json").exists():
-                with open("siem/config.json", "r") as f:
-                    config = json.load(f)
-            config["splunk_user"] = username
-            with open("siem/config.json", "w") as f:
-                json.dump(config, f)
-            self.splunk_user = username
+            self.config.set("splunk_user", username)
+            self._invalidate_token_check()
             return {
                 "success": True,
                 "message": "Splunk username updated successfully"
@@ -117,15 +199,8 @@ class SplunkManager:
     def set_pass(self, password):
         """Set the Splunk password in config file"""
         try:
-            config = {}
-            if Path("siem/config.json").exists():
-                with open("siem/config.json", "r") as f:
-                    config = json.load(f)
-            cipher = self._get_cipher()
-            config["splunk_pass"] = cipher.encrypt(password.encode()).decode()
-            with open("siem/config.json", "w") as f:
-                json.dump(config, f)
-            self.splunk_password = password
+            self.config.set_secret("splunk_pass", password)
+            self._invalidate_token_check()
             return {
                 "success": True,
                 "message": "Splunk password updated successfully"
@@ -136,6 +211,53 @@ class SplunkManager:
                 "message": f"Error: {str(e)}"
             }
 
+    def set_hec_ack(self, enabled):
+        """Turns HEC indexer acknowledgement on or off, applied to the next batches"""
+        try:
+            self.config.set("hec_ack", bool(enabled))
+            return {
+                "success": True,
+                "message": f"HEC indexer acknowledgement {'enabled' if enabled else 'disabled'}"
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"Error: {str(e)}"
+            }
+
+    def set_hec_gzip(self, enabled):
+        """Turns gzip compression of HEC requests on or off, applied to the next batches"""
+        try:
+            self.config.set("hec_gzip", bool(enabled))
+            return {
+                "success": True,
+                "message": f"HEC compression {'enabled' if enabled else 'disabled'}"
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"Error: {str(e)}"
+            }
+
+    def set_hec_max_content_length(self, max_bytes):
+        """Sets the byte limit of HEC batches (Splunk's max_content_length), applied to the next batches"""
+        try:
+            if isinstance(max_bytes, bool) or not isinstance(max_bytes, int) or max_bytes < 1024:
+                return {
+                    "success": False,
+                    "message": "HEC max content length must be an integer of at least 1024 bytes"
+                }
+            self.config.set("hec_max_content_length", max_bytes)
+            return {
+                "success": True,
+                "message": f"HEC batches limited to {max_bytes} bytes"
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"Error: {str(e)}"
+            }
+
     def start(self):
         """Starts Splunk"""
         if not self._is_installed():
@@ -198,37 +320,42 @@ class SplunkManager:
 
     
     # Look for HoneyDash token in Splunk's HTTP Event Collector inputs, NOT another token
-    def search_token(self):
+    def search_token(self, force=False):
+        """Looks for the HoneyDash token, reusing the last check for `token_ttl` seconds unless `force`
+
+        Only conclusive answers (token found or not, invalid credentials) are reused, the cache
+        is dropped when the credentials or the Splunk path change.
+        """
         if not self._is_installed():
             return {
                 "success": False,
                 "message": "Splunk is not installed"
             }
-        
+
+        with self._token_lock:
+            check = self._token_check
+        if not force and check and time.monotonic() - check[0] < self.token_ttl:
+            return dict(check[1])
+
         # running? not calling get_status() to avoid infinite loop
-        try:
-            result = subprocess.run([self.splunk_path / "bin/splunk", "status"], 
-                                    capture_output=True, text=True, timeout=5)
-            if "splunkd is running" not in result.stdout:
-                return {
-                    "success": False,
-                    "message": "Splunk is not running"
-                }
-        except Exception:
+        if not self._is_running():
             return {
                 "success": False,
-                "message": "Error checking Splunk status"
+                "message": "Splunk is not running"
             }
 
-        url = f"{self.splunk_host}/services/data/inputs/http?output_mode=json"
+        result = self._search_token()
+        if "error" not in result:
+            with self._token_lock:
+                self._token_check = (time.monotonic(), dict(result))
+        return result
 
-        auth = base64.b64encode(f"{self.splunk_user}:{self.splunk_password}".encode()).decode()
-        headers = {
-            "Authorization": f"Basic {auth}"
-        }
+    def _search_token(self):
+        """Lists Splunk's HEC inputs looking for the HoneyDash token, validating the credentials"""
+        url = f"{self.splunk_host}/services/data/inputs/http?output_mode=json"
 
         try:
-            r = requests.get(url, headers=headers, verify=False)
+            r = self._management_session().get(url, timeout=self.timeout)
             response = r.json()
 
             for err in response.get("messages", []):
@@ -263,7 +390,7 @@ class SplunkManager:
             }
 
     def create_token(self):
-        search = self.search_token()  # Check if token already exists before creating a new one
+        search = self.search_token(force=True)  # Check if token already exists before creating a new one
         if search.get("success"):
             print("[!] HoneyDash token already exists in Splunk. Not creating a new one.")
             return {
@@ -274,23 +401,19 @@ class SplunkManager:
 
         url = f"{self.splunk_host}/services/data/inputs/http?output_mode=json"
 
-        auth = base64.b64encode(f"{self.splunk_user}:{self.splunk_password}".encode()).decode()
-        headers = {
-            "Authorization": f"Basic {auth}"
-        }
-
         # Minimum required -> token name
         data = {
             "name": "honeydash_token",
         }
 
         try:
-            r = requests.post(url, data=data, headers=headers, verify=False)
+            r = self._management_session().post(url, data=data, timeout=self.timeout)
 
             response = r.json()
 
             token = response.get("entry", [{}])[0].get("content", {}).get("token")
             self.splunk_hec_token = token
+            self._invalidate_token_check()
 
             return {
                 "message": "Token successfully created",
@@ -304,7 +427,7 @@ class SplunkManager:
             }
             
     def send_event(self, event, sourcetype="honeydash", index="main"):
-        """Sends events to Splunk
+        """Queues events for Splunk, they are delivered in the background
         
         Args:
             event: Dictionary with event data
@@ -316,45 +439,23 @@ class SplunkManager:
                 "success": False,
                 "message": "HEC token not found. Please create or find the token first."
             }
-        
-        headers = {
-            "Authorization": f"Splunk {self.splunk_hec_token}",
-            "Content-Type": "application/json"
-        }
 
         try:
             logs = event.get("logs", [])
-            size = len(logs)
-            
-            batch_size = 5000  # Splunk HEC default max batch size = 800MB
-            count = 0
-            
-            for i in range(0, size, batch_size):
-                batch_logs = logs[i:i + batch_size]
-                payload = ""
-                for e in batch_logs:
-                    event_data = {
-                        "event": e,
-                        "sourcetype": sourcetype,
-                        "index": index
-                    }
-                    payload += json.dumps(event_data) + "\n"
-
-                r = requests.post(self.splunk_hec_url, headers=headers, data=payload, verify=False)
-                
-                if r.status_code != 200:
-                    return {
-                        "success": False,
-                        "message": f"Failed to send some events to Splunk: {r.text} (Sent {count}/{size})"
-                    }
-                count += len(batch_logs)
+            # Serialized straight into the spool, one event at a time
+            lines = (
+                json.dumps({"event": e, "sourcetype": sourcetype, "index": index}).encode()
+                for e in logs
+            )
+            job_id = self.forwarder.submit(lines)
                 
             return {
                     "success": True,
-                    "size": count,
+                    "job_id": job_id,
+                    "size": len(logs),
                     "index": index,
                     "sourcetype": sourcetype,
-                    "message": f"{count} events successfully sent to Splunk (index={index}, sourcetype={sourcetype})"
+                    "message": f"{len(logs)} events queued for Splunk (index={index}, sourcetype={sourcetype})"
                 }
         except Exception as e:
             return {
@@ -362,9 +463,125 @@ class SplunkManager:
                 "message": f"Error: {str(e)}"
             }
 
+    def _post_hec(self, lines):
+        """Sends one batch of serialized events to HEC, raising if Splunk does not accept it
+
+        Returns the batch's ack id when indexer acknowledgement is enabled.
+        """
+        if not self.splunk_hec_token:
+            self.search_token()
+            if not self.splunk_hec_token:
+                raise RuntimeError("HEC token not found")
+
+        payload = b"".join(lines)
+        headers = {}
+        if self.hec_gzip:
+            payload = gzip.compress(payload, compresslevel=1)
+            headers["Content-Encoding"] = "gzip"
+        r = self._hec_session().post(self.splunk_hec_url, data=payload, headers=headers, timeout=self.timeout)
+        if r.status_code == 413 or (r.status_code == 400 and self._hec_error_code(r) == 6):
+            # Oversized batches and invalid data format are rejected again on every retry. Other
+            # 400s (incorrect index, missing channel...) are configuration errors, keep retrying
+            raise RejectedBatch(f"Events rejected by Splunk: {r.text}")
+        if r.status_code != 200:
+            raise RuntimeError(f"Failed to send events to Splunk: {r.text}")
+        if self.hec_ack:
+            return r.json().get("ackId")
+
+    @staticmethod
+    def _hec_error_code(r):
+        """HEC status `code` of an error response (6: invalid data format, 7: incorrect index...)"""
+        try:
+            return r.json().get("code")
+        except ValueError:
+            return None
+
+    def _query_hec_acks(self, ack_ids):
+        """Returns which ack ids of our channel Splunk has indexed, in a single request"""
+        r = self._hec_session().post(
+            f"{self.splunk_hec_url}/ack", data=json.dumps({"acks": ack_ids}), timeout=self.timeout
+        )
+        if r.status_code != 200:
+            raise RuntimeError(f"Failed to query Splunk acknowledgements: {r.text}")
+        return {int(ack_id) for ack_id, indexed in r.json().get("acks", {}).items() if indexed}
+
+    def get_job(self, job_id):
+        """Get the delivery state of a /api/splunk/send job"""
+        job = self.forwarder.status(job_id)
+        if job is None:
+            return {
+                "success": False,
+                "message": "Job not found"
+            }
+        return {
+            "success": True,
+            **job
+        }
+
+    def start_shipper(self, sources):
+        """Starts shipping new events server-side (if enabled), sources being {name: get_new_logs}
+
+        Events go to HEC and to the sinks configured in siem/sinks.json. An invalid sinks.json
+        is reported in the shipper status and only HEC is used, instead of failing startup.
+        """
+        try:
+            sinks_config = ConfigStore("siem/sinks.json")
+            hec = sinks_config.get("hec", True)
+            if sinks_config.error:
+                raise ValueError(sinks_config.error)
+            sinks = [HecSink(self)] if hec else []
+            sinks += load_sinks(sinks_config.get("sinks", []))
+            self.pipeline = SinkPipeline(sinks, Path("siem/spool"))
+            self.sinks_error = None
+        except Exception as e:
+            self.sinks_error = f"Invalid siem/sinks.json, shipping to HEC only: {str(e)}"
+            print(f"[-] {self.sinks_error}")
+            self.pipeline = SinkPipeline([HecSink(self)], Path("siem/spool"))
+        self.shipper = Shipper(
+            self.pipeline.submit,
+            sources,
+            Path("siem/shipper-state.json"),
+            interval=self.ship_interval
+        )
+
+    def get_shipper_status(self):
+        """Get whether events are shipped automatically and the per-source counters"""
+        if self.shipper is None:
+            return {
+                "success": False,
+                "message": "Shipper not started"
+            }
+        return {
+            "success": True,
+            **self.shipper.status(),
+            "sinks": self.pipeline.status(),
+            "sinks_error": self.sinks_error
+        }
+
+    def set_shipping(self, enabled):
+        """Turns automatic shipping on or off"""
+        if self.shipper is None:
+            return {
+                "success": False,
+                "message": "Shipper not started"
+            }
+        try:
+            self.shipper.set_enabled(enabled)
+            return {
+                "success": True,
+                "enabled": bool(enabled),
+                "message": f"Automatic shipping to Splunk {'enabled' if enabled else 'disabled'}"
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "message": f"Error: {str(e)}"
+            }
+
     def set_splunk_path(self, path):
         """Manually sets the Splunk installation path"""
         self.splunk_path = Path(path)
+        self._invalidate_token_check()
         
         if self._is_installed():
             return {
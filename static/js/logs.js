@@ -629,7 +629,7 @@ async function sendToSplunk(service) {
 
         const response = await makeRequest('/splunk/send', 'POST', payload);
         if (response.success) {
-            showActionMessage(`${response.size} ${service} logs succesfully sent to Splunk. You can fetch them using the index ${response.index} and sourcetype ${response.sourcetype}.`);
+            showActionMessage(`${response.size} ${service} logs queued for Splunk (job ${response.job_id}). You can fetch them using the index ${response.index} and sourcetype ${response.sourcetype}.`);
         }
     }
     catch (error) {
@@ -962,7 +962,7 @@ async function sendSuricataLogsToSplunk() {
 
         const responseSplunk = await makeRequest('/splunk/send', 'POST', payload);
         if (responseSplunk && responseSplunk.success) {
-            showActionMessage('Suricata alerts successfully sent to Splunk');
+            showActionMessage(`Suricata alerts queued for Splunk (job ${responseSplunk.job_id})`);
         } else {
             showActionMessage('Error sending suricata alerts to Splunk.');
         }